@@ -3,31 +3,27 @@
 # Author:  Nicolas P. Rougier
 # License: BSD
 # ----------------------------------------------------------------------------
-import urllib
+import os
+import sys
 import numpy as np
 import cartopy.crs as ccrs
 import matplotlib.pyplot as plt
 import matplotlib.animation as animation
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import datacache
+from particles import Particles, fade, grow
 
-def rain_update(frame):
-    global E, R, scatter
 
+def rain_update(frame):
     current = frame % len(E)
-    i = frame % len(R)
-
-    R["color"][:, 3] = np.maximum(0, R["color"][:, 3] - 1 / len(R))
-    R["size"] += R["growth"]
-
-    i = frame % len(R)
-    R["position"][i] = E["position"][current]
-    R["size"][i] = 5
-    R["growth"][i] = 0.1 * np.exp(E["magnitude"][current])
-    R["color"][i, 3] = 1
-
-    scatter.set_edgecolors(R["color"])
-    scatter.set_sizes(R["size"].ravel())
-    scatter.set_offsets(R["position"])
+    P.update()
+    P.spawn(
+        position=E["position"][current],
+        size=5,
+        growth=0.1 * np.exp(E["magnitude"][current]),
+        alpha=1,
+    )
 
     if frame == 50:
         plt.savefig("../../figures/chapter-13/earthquakes-frame-50.pdf")
@@ -38,17 +34,16 @@ def rain_update(frame):
 # -> http://earthquake.usgs.gov/earthquakes/feed/v1.0/csv.php
 feed = "http://earthquake.usgs.gov/earthquakes/feed/v1.0/summary/"
 
-# Magnitude > 4.5
-url = urllib.request.urlopen(feed + "4.5_month.csv")
+# Magnitude > 4.5 (cached, see datacache.py)
+data = datacache.array(
+    feed + "4.5_month.csv", datacache.csv("latitude", "longitude", "mag")
+)
 
-# Reading and storage of data
-data = url.read().split(b"\n")[+1:-1]
+# Storage of data
 E = np.zeros(len(data), dtype=[("position", float, (2,)), ("magnitude", float, (1,))])
-
-for i in range(len(data)):
-    row = data[i].split(b",")
-    E["position"][i] = float(row[2]), float(row[1])
-    E["magnitude"][i] = float(row[4])
+E["position"][:, 0] = data["longitude"]
+E["position"][:, 1] = data["latitude"]
+E["magnitude"][:, 0] = data["mag"]
 
 fig = plt.figure(figsize=(10, 5), dpi=75)
 ax = plt.axes(projection=ccrs.PlateCarree())
@@ -64,18 +59,10 @@ scatter = ax.scatter(
 )
 
 n = 50
-R = np.zeros(
-    n,
-    dtype=[
-        ("position", float, (2,)),
-        ("size", float, (1,)),
-        ("growth", float, (1,)),
-        ("color", float, (4,)),
-    ],
-)
-R["position"] = np.random.uniform(0, 1, (n, 2))
-R["size"] = np.linspace(0, 1, n).reshape(n, 1)
-R["color"][:, 3] = np.linspace(0, 1, n)
+P = Particles(scatter, n, rules=[fade(1 / n), grow("growth")], fields={"growth": ()})
+P.position[...] = np.random.uniform(0, 1, (n, 2))
+P.size[...] = np.linspace(0, 1, n)
+P.alpha[...] = np.linspace(0, 1, n)
 
 animation = animation.FuncAnimation(fig, rain_update, interval=10, frames=200)
 plt.tight_layout()
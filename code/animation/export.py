@@ -0,0 +1,175 @@
+# ----------------------------------------------------------------------------
+# Title:   Scientific Visualisation - Python & Matplotlib
+# Author:  Nicolas P. Rougier
+# License: BSD
+# ----------------------------------------------------------------------------
+# Blit-aware movie export
+#
+# Saving an animation with a regular matplotlib writer redraws the whole
+# figure (axes, ticks, static artists) for each frame. When most of the
+# figure is static, it is much faster to render the static background once,
+# and for each frame, to restore this background and only draw the animated
+# artists (the ones returned by the update function, as for blitting). The
+# resulting RGBA buffer is then piped directly to the encoder (ffmpeg).
+#
+# The update function must return all the artists it modifies, exactly as
+# when using FuncAnimation(..., blit=True).
+# ----------------------------------------------------------------------------
+import os
+import subprocess
+import numpy as np
+import matplotlib
+import matplotlib.image
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+
+def encoder(filename, width, height, fps=30, codec="h264", bitrate=None, extra_args=None):
+    """ Return the ffmpeg command reading raw RGBA frames from stdin """
+
+    command = [
+        matplotlib.rcParams["animation.ffmpeg_path"],
+        "-f", "rawvideo", "-vcodec", "rawvideo",
+        "-s", "%dx%d" % (width, height),
+        "-pix_fmt", "rgba",
+        "-r", str(fps),
+        "-loglevel", "error",
+        "-i", "pipe:",
+        "-vcodec", codec,
+        # h264 requires even dimensions
+        "-vf", "pad=ceil(iw/2)*2:ceil(ih/2)*2",
+    ]
+    if codec == "h264":
+        command += ["-pix_fmt", "yuv420p"]
+    if bitrate is not None:
+        command += ["-b", "%dk" % bitrate]
+    command += list(extra_args or []) + ["-y", filename]
+    return command
+
+
+def snapshot(fig, artists, buffer, filename, dpi=None):
+    """
+    Save current frame. PNG snapshots are taken from the frame buffer while
+    other formats (e.g. PDF) are saved as regular (vector) figures.
+    """
+
+    if os.path.splitext(filename)[1].lower() == ".png":
+        matplotlib.image.imsave(filename, buffer)
+        return
+    for artist in artists:
+        artist.set_animated(False)
+    try:
+        fig.savefig(filename, dpi=dpi)
+    finally:
+        for artist in artists:
+            artist.set_animated(True)
+
+
+def save(fig, update, frames, filename, fps=30, dpi=None, codec="h264",
+         bitrate=None, extra_args=None, snapshots=None, progress_callback=None,
+         command=None):
+    """
+    Render frames and encode them into a movie.
+
+    Parameters
+    ----------
+
+    fig : Figure
+        Figure to be animated
+    update : function
+        Function called with each frame (as for FuncAnimation) and returning
+        the sequence of modified (animated) artists.
+    frames : int or iterable
+        Frames to be rendered (range(frames) if int)
+    filename : str
+        Movie filename
+    fps : float, optional
+        Frames per second
+    dpi : float, optional
+        Movie resolution (default to figure dpi)
+    snapshots : dict, optional
+        {frame: filename} of frames to be saved as still images, PNG files are
+        saved from the frame buffer, other formats are saved using savefig.
+    progress_callback : function, optional
+        Called with (index, total) after each frame
+    command : list, optional
+        Encoder command (default to ffmpeg, see encoder)
+    """
+
+    if isinstance(frames, int):
+        frames = range(frames)
+    frames = list(frames)
+    snapshots = snapshots or {}
+
+    # We render offscreen with an Agg canvas (whatever the actual backend)
+    original_canvas = fig.canvas
+    canvas = FigureCanvasAgg(fig)
+    original_dpi = fig.dpi
+    if dpi is not None:
+        fig.set_dpi(dpi)
+
+    try:
+        # Animated artists are excluded from the regular draw, this gives us
+        # the background (static artists) that is rendered only once.
+        artists = list(update(frames[0]) or [])
+        for artist in artists:
+            artist.set_animated(True)
+        canvas.draw()
+        background = canvas.copy_from_bbox(fig.bbox)
+        width, height = canvas.get_width_height()
+
+        command = command or encoder(filename, width, height, fps, codec,
+                                     bitrate, extra_args)
+        process = subprocess.Popen(command, stdin=subprocess.PIPE)
+        try:
+            for index, frame in enumerate(frames):
+                canvas.restore_region(background)
+                for artist in update(frame) or []:
+                    fig.draw_artist(artist)
+                buffer = canvas.buffer_rgba()
+                process.stdin.write(buffer)
+                if frame in snapshots:
+                    snapshot(fig, artists, np.asarray(buffer), snapshots[frame], dpi)
+                if progress_callback is not None:
+                    progress_callback(index, len(frames))
+        finally:
+            process.stdin.close()
+            returncode = process.wait()
+        if returncode != 0:
+            raise RuntimeError("Encoder failed with code %d" % returncode)
+    finally:
+        for artist in artists:
+            artist.set_animated(False)
+        fig.set_dpi(original_dpi)
+        fig.set_canvas(original_canvas)
+
+
+# -----------------------------------------------------------------------------
+if __name__ == "__main__":
+    import time
+    import tempfile
+    import matplotlib.pyplot as plt
+    import matplotlib.animation as animation
+
+    fig = plt.figure(figsize=(7, 2))
+    ax = plt.subplot()
+    X = np.linspace(-np.pi, np.pi, 256, endpoint=True)
+    C, S = np.cos(X), np.sin(X)
+    (line1,) = ax.plot(X, C, marker="o", markevery=[-1], markeredgecolor="white")
+    (line2,) = ax.plot(X, S, marker="o", markevery=[-1], markeredgecolor="white")
+
+    def update(frame):
+        line1.set_data(X[:frame], C[:frame])
+        line2.set_data(X[:frame], S[:frame])
+        return line1, line2
+
+    directory = tempfile.mkdtemp()
+    start = time.perf_counter()
+    anim = animation.FuncAnimation(fig, update, frames=len(X))
+    filename = os.path.join(directory, "sine-cosine-regular.mp4")
+    anim.save(filename, writer=animation.FFMpegWriter(fps=30))
+    print("Regular export: %.2fs" % (time.perf_counter() - start))
+
+    start = time.perf_counter()
+    filename = os.path.join(directory, "sine-cosine-blit.mp4")
+    save(fig, update, len(X), filename, fps=30)
+    print("Blit export:    %.2fs" % (time.perf_counter() - start))
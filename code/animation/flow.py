@@ -0,0 +1,314 @@
+# ----------------------------------------------------------------------------
+# Title:   Scientific Visualisation - Python & Matplotlib
+# Author:  Nicolas P. Rougier
+# License: BSD
+# ----------------------------------------------------------------------------
+# Flow visualization over velocity snapshots
+#
+# Velocity snapshots (e.g. the velocity of a Fluid at each step, possibly
+# baked in a store) are linearly interpolated in time such that:
+#
+# - streamlines of each frame are computed incrementally: streamlines of
+#   the previous frame that are still tangent (up to a tolerance) to the
+#   velocity are kept and new (evenly spaced) streamlines are only placed
+#   where the previous ones became invalid.
+# - pathlines (trajectories of particles) and streaklines (particles
+#   continuously released from fixed points) are integrated (RK4) through
+#   the time interpolated velocity.
+#
+# Velocity is expected in grid units (X and Y) per frame, which is the case
+# for Fluid (indices per step).
+#
+# Usage:
+#
+#   flow = FlowField(store, key="velocity")
+#   lines = FlowStreamlines(flow, d_sep=8)
+#   streaks = Streaklines(flow, seeds, length=50)
+#   def update(frame):
+#       collection.set_segments(segments(lines(frame))[0])
+#       streaks.step()
+#
+#   P, count = pathlines(flow, seeds, start=0, stop=100)
+# ----------------------------------------------------------------------------
+import os
+import sys
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "showcases"))
+from streamlines import Grid, evenly_spaced, segments
+
+
+class FlowField:
+    """
+    Time interpolated velocity field.
+
+    Parameters
+    ----------
+
+    frames : sequence
+        Velocity snapshots, (2, ny, nx) arrays whose first component is
+        along rows (y) and second along columns (x), as Fluid.velocity
+    key : str, optional
+        Name of the velocity when frames are dictionaries (e.g. a Store)
+    X, Y : array-like, optional
+        Grid coordinates (default to column and row indices)
+    """
+
+    def __init__(self, frames, key=None, X=None, Y=None):
+        self.frames = frames
+        self.key = key
+        ny, nx = self.snapshot(0).shape[1:]
+        self.X = np.arange(nx) if X is None else X
+        self.Y = np.arange(ny) if Y is None else Y
+        self.grids = {}
+
+    def __len__(self):
+        return len(self.frames)
+
+    def snapshot(self, frame):
+        """ Velocity snapshot (2, ny, nx) of a frame """
+
+        V = self.frames[frame]
+        return np.asarray(V if self.key is None else V[self.key])
+
+    def grid(self, frame):
+        """ Velocity field (Grid) of a frame """
+
+        if frame not in self.grids:
+            # Integration over a step only needs two or three frames
+            if len(self.grids) >= 3:
+                self.grids.pop(next(iter(self.grids)))
+            V = self.snapshot(frame)
+            self.grids[frame] = Grid(self.X, self.Y, V[1], V[0])
+        return self.grids[frame]
+
+    def velocity(self, P, t):
+        """ Velocity at points P (n, 2) and time t (in frames) """
+
+        i = int(np.clip(np.floor(t), 0, len(self) - 2))
+        a = float(np.clip(t - i, 0, 1))
+        if a == 0:
+            return self.grid(i).velocity(P)
+        if a == 1:
+            return self.grid(i + 1).velocity(P)
+        return (1 - a) * self.grid(i).velocity(P) + a * self.grid(i + 1).velocity(P)
+
+    def advance(self, P, t, dt):
+        """ Positions at time t + dt of particles P at time t (RK4) """
+
+        k1 = self.velocity(P, t)
+        k2 = self.velocity(P + dt / 2 * k1, t + dt / 2)
+        k3 = self.velocity(P + dt / 2 * k2, t + dt / 2)
+        k4 = self.velocity(P + dt * k3, t + dt)
+        return P + dt / 6 * (k1 + 2 * k2 + 2 * k3 + k4)
+
+
+def pathlines(flow, seeds, start, stop, dt=1.0):
+    """
+    Trajectories of particles released from seeds at time start.
+
+    Parameters
+    ----------
+
+    flow : FlowField
+        Velocity field
+    seeds : array-like
+        (n, 2) initial positions
+    start, stop : float
+        Time interval (in frames)
+    dt : float, optional
+        Time step
+
+    Returns
+    -------
+
+    (steps+1, n, 2) array of positions and the number of positions of each
+    particle (particles are stopped when they leave the domain).
+    """
+
+    seeds = np.asarray(seeds, dtype=float).reshape(-1, 2)
+    steps = int(np.ceil((stop - start) / dt))
+    grid = flow.grid(int(np.clip(start, 0, len(flow) - 1)))
+    P = np.empty((steps + 1, len(seeds), 2))
+    P[0] = seeds
+    count = np.ones(len(seeds), dtype=int)
+    active = np.nonzero(grid.inside(seeds))[0]
+    for k in range(1, steps + 1):
+        if not len(active):
+            return P[:k], count
+        Q = flow.advance(P[k - 1, active], start + (k - 1) * dt, dt)
+        P[k, active] = Q
+        count[active] += 1
+        active = active[grid.inside(Q)]
+    return P, count
+
+
+class Streaklines:
+    """
+    Particles continuously released (one per step) from fixed seeds and
+    advected through the flow. A streakline is made of the particles
+    released from the same seed, from the youngest to the oldest.
+
+    Parameters
+    ----------
+
+    flow : FlowField
+        Velocity field
+    seeds : array-like
+        (n, 2) release points
+    length : int, optional
+        Maximum number of particles (age) per streakline
+    start : float, optional
+        Release time of the first particles (in frames)
+    dt : float, optional
+        Time step
+    """
+
+    def __init__(self, flow, seeds, length=100, start=0, dt=1.0):
+        self.flow = flow
+        self.seeds = np.asarray(seeds, dtype=float).reshape(-1, 2)
+        self.time = start
+        self.dt = dt
+        # Ring buffer (by age) of particles, nan for no particle
+        self.particles = np.full((length, len(self.seeds), 2), np.nan)
+        self.head = 0
+        self.particles[0] = self.seeds
+
+    def step(self):
+        """ Advect all particles by one step and release new ones """
+
+        P = self.particles
+        alive = np.isfinite(P[..., 0])
+        Q = self.flow.advance(P[alive], self.time, self.dt)
+        grid = self.flow.grid(int(np.clip(self.time, 0, len(self.flow) - 1)))
+        Q[~grid.inside(Q)] = np.nan
+        P[alive] = Q
+        self.time += self.dt
+        # Oldest particles are replaced by new ones
+        self.head = (self.head - 1) % len(P)
+        P[self.head] = self.seeds
+
+    def lines(self):
+        """ (n, length, 2) particles of each seed, youngest first (nan if none) """
+
+        order = (self.head + np.arange(len(self.particles))) % len(self.particles)
+        return self.particles[order].transpose(1, 0, 2)
+
+    def segments(self):
+        """
+        Segments between successive particles (for a single line collection)
+        and age (of their oldest particle) of each segment.
+        """
+
+        L = self.lines()
+        S = np.stack([L[:, :-1], L[:, 1:]], axis=2).reshape(-1, 2, 2)
+        age = np.tile(np.arange(1, L.shape[1]), L.shape[0])
+        valid = np.isfinite(S).all(axis=(1, 2))
+        return S[valid], age[valid]
+
+
+class FlowStreamlines:
+    """
+    Evenly spaced streamlines of each frame, computed incrementally:
+    streamlines of the previous frame that are still tangent to velocity
+    (up to tolerance) are kept and new streamlines are only placed around
+    them.
+
+    Parameters
+    ----------
+
+    flow : FlowField
+        Velocity field
+    d_sep : float
+        Separation distance (see streamlines.evenly_spaced)
+    tolerance : float, optional
+        Maximum angle (degrees) between a kept streamline and velocity
+    **kwargs
+        Other evenly_spaced parameters (d_test, h, min_length, ...)
+    """
+
+    def __init__(self, flow, d_sep, tolerance=10, **kwargs):
+        self.flow = flow
+        self.d_sep = d_sep
+        self.cos = np.cos(np.radians(tolerance))
+        self.kwargs = kwargs
+        self.streamlines = []
+        self.kept = 0
+
+    def valid(self, grid, streamlines):
+        """ Whether each streamline is still tangent to the velocity of grid """
+
+        if not streamlines:
+            return np.zeros(0, dtype=bool)
+        S, index, _ = segments(streamlines)
+        T = S[:, 1] - S[:, 0]
+        T /= np.hypot(*T.T)[:, None]
+        M = S.mean(axis=1)
+        # Null velocity (nan) or points outside the domain are invalid
+        cos = (T * grid.direction(M)).sum(axis=-1)
+        invalid = ~(cos >= self.cos) | ~grid.inside(M)
+        valid = np.ones(len(streamlines), dtype=bool)
+        valid[index[invalid]] = False
+        return valid
+
+    def __call__(self, frame):
+        """ Streamlines (list of arrays of points) of a frame """
+
+        grid = self.flow.grid(frame)
+        kept = [
+            points for points, valid in
+            zip(self.streamlines, self.valid(grid, self.streamlines)) if valid
+        ]
+        self.kept = len(kept)
+        self.streamlines = evenly_spaced(
+            grid.x, grid.y, grid.u, grid.v, self.d_sep, streamlines=kept, **self.kwargs
+        )
+        return self.streamlines
+
+
+# -----------------------------------------------------------------------------
+if __name__ == "__main__":
+    import time
+    from fluid import Fluid, inflow
+
+    # Velocity snapshots of a small simulation
+    shape, frames = (128, 128), 60
+    fluid = Fluid(shape, "dye", pressure_solver="spectral")
+    inflows = [inflow(fluid, x, padding=10, radius=4, velocity=1)
+               for x in np.linspace(-np.pi, np.pi, 4, endpoint=False)]
+    snapshots = []
+    for frame in range(frames):
+        for inflow_velocity, inflow_dye in inflows:
+            fluid.velocity += inflow_velocity
+        fluid.step()
+        snapshots.append(fluid.velocity.copy())
+    flow = FlowField(snapshots)
+
+    start = time.perf_counter()
+    lines = FlowStreamlines(flow, d_sep=4)
+    placed = kept = 0
+    for frame in range(frames):
+        placed += len(lines(frame))
+        kept += lines.kept
+    elapsed = (time.perf_counter() - start) / frames
+    print("Streamlines: %.1f ms / frame, %d%% kept from previous frame"
+          % (1000 * elapsed, 100 * kept / placed))
+
+    start = time.perf_counter()
+    for frame in range(frames):
+        evenly_spaced(flow.X, flow.Y, *flow.snapshot(frame)[::-1], d_sep=4)
+    elapsed = (time.perf_counter() - start) / frames
+    print("Streamlines (from scratch): %.1f ms / frame" % (1000 * elapsed))
+
+    seeds = np.random.uniform(16, 112, (1000, 2))
+    start = time.perf_counter()
+    P, count = pathlines(flow, seeds, 0, frames - 1)
+    elapsed = time.perf_counter() - start
+    print("Pathlines: %d particles, %d steps, %.2fs" % (len(seeds), len(P) - 1, elapsed))
+
+    streaks = Streaklines(flow, seeds[:100], length=50)
+    start = time.perf_counter()
+    for frame in range(frames - 1):
+        streaks.step()
+    elapsed = (time.perf_counter() - start) / (frames - 1)
+    print("Streaklines: %d segments, %.1f ms / step" % (len(streaks.segments()[0]), 1000 * elapsed))
@@ -3,16 +3,17 @@
 # Author:  Nicolas P. Rougier
 # License: BSD
 # ----------------------------------------------------------------------------
+import sys
 import numpy as np
 from fluid import Fluid, inflow
+from store import bake
 from scipy.special import erf
 import matplotlib.pyplot as plt
-import matplotlib.animation as animation
+from framecache import CachedAnimation
+from timing import from_environment
 
 shape = 256, 256
 duration = 500
-fluid = Fluid(shape, "dye")
-inflows = [inflow(fluid, x) for x in np.linspace(-np.pi, np.pi, 8, endpoint=False)]
 
 # Animation setup
 fig = plt.figure(figsize=(5, 5), dpi=100)
@@ -38,26 +39,59 @@ for i in range(8):
 scenario.extend([[0, 2, 4, 6]] * 30)
 scenario.extend([[1, 3, 5, 7]] * 30)
 
-# Animation update
-def update(frame):
+# Simulation is run once and stored on disk (baked), it is only run again
+# when the scenario changes.
+fluid = Fluid(shape, "dye", dtype=np.float32, pressure_solver="spectral")
+inflows = [inflow(fluid, x) for x in np.linspace(-np.pi, np.pi, 8, endpoint=False)]
+
+
+def simulate(frame):
     for i in scenario[frame % len(scenario)]:
         inflow_velocity, inflow_dye = inflows[i]
         fluid.velocity += inflow_velocity
         fluid.dye += inflow_dye
     divergence, curl, pressure = fluid.step()
-    Z = curl
+    return {
+        "curl": curl.astype(np.float32),
+        "dye": fluid.dye.astype(np.float32),
+        "velocity": fluid.velocity.astype(np.float32),
+    }
+
+
+store = bake(
+    "../../.cache/fluid-animation",
+    simulate,
+    duration,
+    metadata={"shape": shape, "scenario": scenario, "solver": "spectral"},
+)
+
+# Animation update (frames are read lazily from the store)
+def update(frame):
+    Z = store[frame]["curl"]
     Z = (erf(Z * 2) + 1) / 4
 
     im.set_data(Z)
     im.set_clim(vmin=Z.min(), vmax=Z.max())
 
     text.set_text("Frame %d" % frame)
-    if frame in [30, 60, 90, 120, 150, 180, 210, 240]:
-        plt.savefig("../../figures/animation/fluid-animation-%03d.png" % frame, dpi=300)
-
     return im, text
 
 
 text = ax.text(0.01, 0.99, "Test", ha="left", va="top", transform=ax.transAxes)
-anim = animation.FuncAnimation(fig, update, interval=10, frames=duration)
-plt.show()
+
+# Rendered frames are cached, the state must describe everything they
+# depend on (simulation and rendering parameters).
+anim = CachedAnimation(
+    fig,
+    update,
+    duration,
+    state={"simulation": store.metadata, "cmap": im.get_cmap().name},
+    directory="../../.cache/frames/fluid-animation",
+    timer=from_environment(interval=10, overlay=False),
+)
+
+# Stills (for the book) are only exported on request
+if "--stills" in sys.argv[1:]:
+    for frame in [30, 60, 90, 120, 150, 180, 210, 240]:
+        anim.still(frame, "../../figures/animation/fluid-animation-%03d.png" % frame, dpi=300)
+anim.show(interval=10)
@@ -0,0 +1,100 @@
+# ----------------------------------------------------------------------------
+# Title:   Scientific Visualisation - Python & Matplotlib
+# Author:  Nicolas P. Rougier
+# License: BSD
+# ----------------------------------------------------------------------------
+# Benchmark of the fluid pressure solvers (sparse LU, spectral and multigrid):
+# setup time, time per step (pressure solve and whole step), peak memory and
+# relative residual of the pressure equation.
+#
+# Each case is run in a fresh process such that peak memory is meaningful.
+# The sparse LU solver is skipped for large grids (see --lu-limit) since its
+# factorization does not fit in memory.
+#
+# Usage: python fluid-benchmark.py [--steps 10] [--lu-limit 1048576]
+#        python fluid-benchmark.py --shapes 256x256 64x64x64
+# ----------------------------------------------------------------------------
+import time
+import resource
+import argparse
+import multiprocessing
+import numpy as np
+from fluid import Fluid, operator, difference
+
+shapes_2d = [(128, 128), (256, 256), (512, 512), (1024, 1024), (2048, 2048)]
+shapes_3d = [(32, 32, 32), (48, 48, 48), (64, 64, 64)]
+
+
+def benchmark(name, shape, steps, queue):
+    """ Run a single case and put results in queue """
+
+    # Smooth random initial velocity
+    rng = np.random.default_rng(1)
+    velocity = rng.uniform(-1, 1, (len(shape), *shape))
+    for axis in range(1, len(shape) + 1):
+        velocity = (velocity + np.roll(velocity, 1, axis) + np.roll(velocity, -1, axis)) / 3
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    start = time.perf_counter()
+    fluid = Fluid(shape, "dye", pressure_solver=name)
+    setup = time.perf_counter() - start
+    fluid.velocity[...] = velocity
+
+    # Time spent in the pressure solver
+    solver, solve = fluid.pressure_solver, [0.0]
+
+    def timed(divergence):
+        start = time.perf_counter()
+        pressure = solver(divergence)
+        solve[0] += time.perf_counter() - start
+        return pressure
+
+    fluid.pressure_solver = timed
+    start = time.perf_counter()
+    for i in range(steps):
+        divergence, curl, pressure = fluid.step()
+    step = (time.perf_counter() - start) / steps
+    memory = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - baseline
+
+    laplacian = operator(shape, difference(2, 1))
+    residual = laplacian @ pressure.ravel() - divergence.ravel()
+    residual = np.linalg.norm(residual) / np.linalg.norm(divergence)
+    queue.put((setup, solve[0] / steps, step, memory / 1024, residual))
+
+
+# -----------------------------------------------------------------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fluid pressure solvers benchmark")
+    parser.add_argument("--shapes", nargs="*", help="Shapes (e.g. 256x256)")
+    parser.add_argument("--solvers", nargs="*", default=["lu", "spectral", "multigrid"])
+    parser.add_argument("--steps", type=int, default=10)
+    parser.add_argument(
+        "--lu-limit", type=int, default=1024 * 1024, help="Maximum size for LU"
+    )
+    args = parser.parse_args()
+
+    shapes = shapes_2d + shapes_3d
+    if args.shapes:
+        shapes = [tuple(int(n) for n in s.split("x")) for s in args.shapes]
+
+    context = multiprocessing.get_context("spawn")
+    print("%-14s %-10s %10s %10s %10s %10s %10s"
+          % ("shape", "solver", "setup (s)", "solve (s)", "step (s)", "mem (MB)", "residual"))
+    for shape in shapes:
+        for name in args.solvers:
+            label = "x".join(str(n) for n in shape)
+            if name == "lu" and np.prod(shape) > args.lu_limit:
+                print("%-14s %-10s %10s" % (label, name, "skipped"))
+                continue
+            queue = context.Queue()
+            process = context.Process(
+                target=benchmark, args=(name, shape, args.steps, queue)
+            )
+            process.start()
+            process.join()
+            if process.exitcode != 0:
+                print("%-14s %-10s %10s" % (label, name, "failed"))
+                continue
+            setup, solve, step, memory, residual = queue.get()
+            print("%-14s %-10s %10.3f %10.4f %10.4f %10.1f %10.1e"
+                  % (label, name, setup, solve, step, memory, residual), flush=True)
@@ -2,12 +2,13 @@
 # This is free and unencumbered software released into the public domain.
 
 import numpy as np
+import scipy.fft
 import scipy.sparse as sp
 from math import factorial
 from itertools import cycle
 from functools import reduce
 from scipy.sparse.linalg import factorized
-from scipy.ndimage import map_coordinates, spline_filter
+from scipy.ndimage import map_coordinates, spline_filter1d
 
 
 def difference(derivative, accuracy=1):
@@ -29,69 +30,284 @@ def operator(shape, *differences):
     return reduce(lambda a, f: sp.kronsum(f, a, format="csc"), factors)
 
 
+def _edge(ndim, axis, index):
+    # Index of a slice (or a single index) along the given axis
+    key = [slice(None)] * ndim
+    key[axis] = index
+    return tuple(key)
+
+
+class SparseSolver:
+    """ Pressure solver using a sparse LU factorization of the Laplacian """
+
+    def __init__(self, shape, order=1):
+        self.shape = shape
+        self.solve = factorized(operator(shape, difference(2, order)))
+
+    def __call__(self, divergence):
+        return self.solve(divergence.ravel()).reshape(self.shape)
+
+
+class SpectralSolver:
+    """
+    Pressure solver using fast sine (Dirichlet) or cosine (Neumann)
+    transforms, which diagonalize the second order Laplacian such that
+    setup is free and solving is O(n log n). For Dirichlet boundaries, the
+    solution is the same (up to round-off) as the one of the sparse solver.
+    """
+
+    def __init__(self, shape, order=1, boundary="dirichlet", workers=-1):
+        if order != 1:
+            raise ValueError("Spectral solver only supports pressure_order=1")
+        if boundary not in ("dirichlet", "neumann"):
+            raise ValueError("Unknown boundary condition: %s" % boundary)
+        self.shape = shape
+        self.boundary = boundary
+        self.workers = workers
+
+        # Eigenvalues of the Laplacian (sum of the 1D eigenvalues)
+        eigenvalues = 0
+        for axis, n in enumerate(shape):
+            k = np.arange(n).reshape([-1 if i == axis else 1 for i in range(len(shape))])
+            if boundary == "dirichlet":
+                eigenvalues = eigenvalues + 2 * np.cos(np.pi * (k + 1) / (n + 1)) - 2
+            else:
+                eigenvalues = eigenvalues + 2 * np.cos(np.pi * k / n) - 2
+        if boundary == "neumann":
+            # Pressure is defined up to a constant (zero mean)
+            eigenvalues.flat[0] = np.inf
+        self.eigenvalues = eigenvalues
+
+    def __call__(self, divergence):
+        if self.boundary == "dirichlet":
+            forward, inverse, kind = scipy.fft.dstn, scipy.fft.idstn, 1
+        else:
+            forward, inverse, kind = scipy.fft.dctn, scipy.fft.idctn, 2
+        Z = forward(divergence, type=kind, workers=self.workers)
+        Z /= self.eigenvalues
+        return inverse(Z, type=kind, workers=self.workers)
+
+
+class MultigridSolver:
+    """
+    Geometric multigrid (V-cycles) pressure solver for the second order
+    Laplacian with Dirichlet boundaries. Grids are coarsened (cell-centered)
+    while sizes are even, the coarsest grid is solved with a sparse LU.
+    The previous solution is used as initial guess, such that only a few
+    cycles are needed when the pressure changes slowly.
+    """
+
+    def __init__(self, shape, order=1, tolerance=1e-5, cycles=20, smooth=2, coarsest=16):
+        if order != 1:
+            raise ValueError("Multigrid solver only supports pressure_order=1")
+        self.shape = shape
+        self.tolerance = tolerance
+        self.cycles = cycles
+        self.smooth = smooth
+        self.iterations = 0
+
+        d = len(shape)
+        self.omega = 2 / 3 if d == 2 else 6 / 7
+        levels = [tuple(shape)]
+        while all(n % 2 == 0 for n in levels[-1]) and min(levels[-1]) > coarsest:
+            levels.append(tuple(n // 2 for n in levels[-1]))
+        self.levels = levels
+
+        # Boundary (wall) stays at the same place on all levels: the ghost
+        # value (outside the grid) is a linear extrapolation beta * u[0]
+        # such that the pressure is zero on the wall.
+        self.spacing = [2.0 ** l for l in range(len(levels))]
+        self.beta = [1 - 2 / (1 + 2.0 ** -l) for l in range(len(levels))]
+        self.diagonal = []
+        for size, h, beta in zip(levels, self.spacing, self.beta):
+            D = np.full(size, -2.0 * d)
+            for axis in range(d):
+                D[_edge(d, axis, 0)] += beta
+                D[_edge(d, axis, -1)] += beta
+            self.diagonal.append(D / h ** 2)
+
+        # Coarsest level
+        factors = []
+        for n in levels[-1]:
+            M = sp.diags([1.0, -2.0, 1.0], [-1, 0, 1], shape=(n, n), format="lil")
+            M[0, 0] += self.beta[-1]
+            M[n - 1, n - 1] += self.beta[-1]
+            factors.append(M.tocsc())
+        laplacian = reduce(lambda a, f: sp.kronsum(f, a, format="csc"), factors)
+        self.coarse = factorized(laplacian / self.spacing[-1] ** 2)
+        self.guess = np.zeros(shape)
+
+    def laplacian(self, u, level):
+        h, beta = self.spacing[level], self.beta[level]
+        L = -2.0 * u.ndim * u
+        for axis in range(u.ndim):
+            L[_edge(u.ndim, axis, slice(0, -1))] += u[_edge(u.ndim, axis, slice(1, None))]
+            L[_edge(u.ndim, axis, slice(1, None))] += u[_edge(u.ndim, axis, slice(0, -1))]
+            L[_edge(u.ndim, axis, 0)] += beta * u[_edge(u.ndim, axis, 0)]
+            L[_edge(u.ndim, axis, -1)] += beta * u[_edge(u.ndim, axis, -1)]
+        L /= h ** 2
+        return L
+
+    def restrict(self, u, level):
+        # Transpose of the interpolation (scaled)
+        beta = self.beta[level + 1]
+        for axis in range(u.ndim):
+            even = u[_edge(u.ndim, axis, slice(0, None, 2))]
+            odd = u[_edge(u.ndim, axis, slice(1, None, 2))]
+            R = 0.375 * (even + odd)
+            R[_edge(u.ndim, axis, slice(1, None))] += 0.125 * odd[_edge(u.ndim, axis, slice(0, -1))]
+            R[_edge(u.ndim, axis, slice(0, -1))] += 0.125 * even[_edge(u.ndim, axis, slice(1, None))]
+            R[_edge(u.ndim, axis, 0)] += 0.125 * beta * even[_edge(u.ndim, axis, 0)]
+            R[_edge(u.ndim, axis, -1)] += 0.125 * beta * odd[_edge(u.ndim, axis, -1)]
+            u = R
+        return u
+
+    def interpolate(self, u, level):
+        # Linear interpolation from level+1 to level
+        beta = self.beta[level + 1]
+        for axis in range(u.ndim):
+            n = u.shape[axis]
+            first = u[_edge(u.ndim, axis, slice(0, 1))]
+            last = u[_edge(u.ndim, axis, slice(-1, None))]
+            before = np.concatenate([beta * first, u[_edge(u.ndim, axis, slice(0, -1))]], axis)
+            after = np.concatenate([u[_edge(u.ndim, axis, slice(1, None))], beta * last], axis)
+            I = np.empty(u.shape[: axis + 1] + (2,) + u.shape[axis + 1 :])
+            I[_edge(I.ndim, axis + 1, 0)] = 0.75 * u + 0.25 * before
+            I[_edge(I.ndim, axis + 1, 1)] = 0.75 * u + 0.25 * after
+            u = I.reshape(u.shape[:axis] + (2 * n,) + u.shape[axis + 1 :])
+        return u
+
+    def vcycle(self, u, b, level=0):
+        if level == len(self.levels) - 1:
+            return self.coarse(b.ravel()).reshape(b.shape)
+        D = self.diagonal[level]
+        for _ in range(self.smooth):
+            u += self.omega * (b - self.laplacian(u, level)) / D
+        residual = self.restrict(b - self.laplacian(u, level), level)
+        error = self.vcycle(np.zeros_like(residual), residual, level + 1)
+        u += self.interpolate(error, level)
+        for _ in range(self.smooth):
+            u += self.omega * (b - self.laplacian(u, level)) / D
+        return u
+
+    def __call__(self, divergence):
+        b = np.asarray(divergence, dtype=float)
+        u = self.guess.copy()
+        norm = np.linalg.norm(b) or 1
+        for self.iterations in range(1, self.cycles + 1):
+            u = self.vcycle(u, b)
+            if np.linalg.norm(b - self.laplacian(u, 0)) <= self.tolerance * norm:
+                break
+        self.guess = u
+        return u
+
+
+solvers = {"lu": SparseSolver, "spectral": SpectralSolver, "multigrid": MultigridSolver}
+
+
 class Fluid:
-    def __init__(self, shape, *quantities, pressure_order=1, advect_order=3):
+    def __init__(
+        self,
+        shape,
+        *quantities,
+        pressure_order=1,
+        advect_order=3,
+        dtype=np.float64,
+        pressure_solver="lu",
+    ):
         self.shape = shape
         self.dimensions = len(shape)
+        self.dtype = dtype
 
         # Prototyping is simplified by dynamically
         # creating advected quantities as needed.
         self.quantities = quantities
         for q in quantities:
-            setattr(self, q, np.zeros(shape))
+            setattr(self, q, np.zeros(shape, dtype=dtype))
 
-        self.indices = np.indices(shape)
-        self.velocity = np.zeros((self.dimensions, *shape))
+        self.indices = np.indices(shape).astype(dtype)
+        self.velocity = np.zeros((self.dimensions, *shape), dtype=dtype)
 
-        laplacian = operator(shape, difference(2, pressure_order))
-        self.pressure_solver = factorized(laplacian)
+        # Pressure solver is either a name ("lu", "spectral" or "multigrid")
+        # or a class (or function) called with shape and pressure order.
+        if isinstance(pressure_solver, str):
+            pressure_solver = solvers[pressure_solver]
+        self.pressure_solver = pressure_solver(shape, pressure_order)
 
         self.advect_order = advect_order
 
-    def step(self):
+        # Work buffers: all advected fields (velocity components and
+        # quantities) are stacked such that they can be filtered at once and
+        # sampled with the same advection map.
+        count = self.dimensions + len(quantities)
+        self._fields = np.empty((count, *shape), dtype=dtype)
+        self._filtered = np.empty((count, *shape), dtype=dtype)
+        self._advection_map = np.empty((self.dimensions, *shape), dtype=dtype)
+
+    def advect(self, filter_epsilon=10e-2, mode="constant"):
+        """ Advect velocity and quantities (in place) """
+
+        fields, filtered = self._fields, self._filtered
+        fields[: self.dimensions] = self.velocity
+        for i, q in enumerate(self.quantities):
+            fields[self.dimensions + i] = getattr(self, q)
+
         # Advection is computed backwards in time as described in Stable Fluids.
-        advection_map = self.indices - self.velocity
+        np.subtract(self.indices, self.velocity, out=self._advection_map)
 
         # SciPy's spline filter introduces checkerboard divergence.
         # A linear blend of the filtered and unfiltered fields based
         # on some value epsilon eliminates this error.
-        def advect(field, filter_epsilon=10e-2, mode="constant"):
-            filtered = spline_filter(field, order=self.advect_order, mode=mode)
-            field = filtered * (1 - filter_epsilon) + field * filter_epsilon
-            return map_coordinates(
+        # Filtering is done along spatial axes only, for all fields at once.
+        source = fields
+        for axis in range(1, self.dimensions + 1):
+            spline_filter1d(
+                source, self.advect_order, axis=axis, mode=mode, output=filtered
+            )
+            source = filtered
+        filtered *= 1 - filter_epsilon
+        filtered += filter_epsilon * fields
+
+        # Apply advection to each axis of the velocity field and each
+        # user-defined quantity, sharing the same advection map.
+        for field, output in zip(filtered, fields):
+            map_coordinates(
                 field,
-                advection_map,
+                self._advection_map,
                 prefilter=False,
                 order=self.advect_order,
                 mode=mode,
+                output=output,
             )
+        self.velocity[...] = fields[: self.dimensions]
+        for i, q in enumerate(self.quantities):
+            getattr(self, q)[...] = fields[self.dimensions + i]
 
-        # Apply advection to each axis of the
-        # velocity field and each user-defined quantity.
-        for d in range(self.dimensions):
-            self.velocity[d] = advect(self.velocity[d])
-
-        for q in self.quantities:
-            setattr(self, q, advect(getattr(self, q)))
-
-        # Compute the jacobian at each point in the
-        # velocity field to extract curl and divergence.
-        jacobian_shape = (self.dimensions,) * 2
-        partials = tuple(np.gradient(d) for d in self.velocity)
-        jacobian = np.stack(partials).reshape(*jacobian_shape, *self.shape)
+    def step(self):
+        self.advect()
 
-        divergence = jacobian.trace()
+        # Compute the partial derivatives of the velocity field to extract
+        # divergence and curl (only the needed partials are computed).
+        divergence = np.zeros(self.shape, dtype=self.dtype)
+        for d in range(self.dimensions):
+            divergence += np.gradient(self.velocity[d], axis=d)
 
         # If this curl calculation is extended to 3D, the y-axis value must be negated.
         # This corresponds to the coefficients of the levi-civita symbol in that dimension.
         # Higher dimensions do not have a vector -> scalar, or vector -> vector,
         # correspondence between velocity and curl due to differing isomorphisms
         # between exterior powers in dimensions != 2 or 3 respectively.
-        curl_mask = np.triu(np.ones(jacobian_shape, dtype=bool), k=1)
-        curl = (jacobian[curl_mask] - jacobian[curl_mask.T]).squeeze()
+        curl = np.stack(
+            [
+                np.gradient(self.velocity[i], axis=j)
+                - np.gradient(self.velocity[j], axis=i)
+                for i in range(self.dimensions)
+                for j in range(i + 1, self.dimensions)
+            ]
+        ).squeeze()
 
         # Apply the pressure correction to the fluid's velocity field.
-        pressure = self.pressure_solver(divergence.flatten()).reshape(self.shape)
+        pressure = self.pressure_solver(divergence)
         self.velocity -= np.gradient(pressure)
         return divergence, curl, pressure
 
@@ -0,0 +1,303 @@
+# ----------------------------------------------------------------------------
+# Title:   Scientific Visualisation - Python & Matplotlib
+# Author:  Nicolas P. Rougier
+# License: BSD
+# ----------------------------------------------------------------------------
+# Memoizing frame cache for animations
+#
+# Frames are rendered offscreen (Agg) once and their pixels are kept in a
+# cache (least recently used frames are evicted from memory and spilled to
+# disk when a directory is given). Replays, scrubbing, saving (e.g. both a
+# GIF and a MP4) and still extraction then reuse pixels instead of updating
+# and drawing the figure again.
+#
+# Frames are identified by their index and a hash of a user declared state
+# (any JSON serializable object describing everything frames depend on, e.g.
+# simulation parameters) such that changing the state invalidates the cache.
+# The update function must only depend on the frame (and the state), unless
+# sequential is set, in which case frames are always rendered in order.
+#
+# Usage:
+#
+#   anim = CachedAnimation(fig, update, 500, state={"n": n},
+#                          directory="../../.cache/frames/name")
+#   anim.save("movie.mp4")
+#   anim.save("movie.gif")
+#   anim.still(100, "frame-100.png")
+#   anim.show()
+# ----------------------------------------------------------------------------
+import os
+import json
+import hashlib
+import subprocess
+import collections
+import numpy as np
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+from export import encoder
+
+
+class FrameCache:
+    """
+    Least recently used cache of frames (arrays) with a fixed capacity in
+    memory. Evicted frames are saved in directory (if given).
+    """
+
+    def __init__(self, capacity=128, directory=None):
+        self.capacity = capacity
+        self.directory = directory
+        self.frames = collections.OrderedDict()
+        self.hits = self.misses = 0
+
+    def filename(self, key):
+        return os.path.join(self.directory, key + ".npy")
+
+    def spill(self, key, frame):
+        """ Save a frame on disk (if not already there) """
+
+        if self.directory is None:
+            return
+        filename = self.filename(key)
+        if not os.path.exists(filename):
+            os.makedirs(os.path.dirname(filename), exist_ok=True)
+            np.save(filename + ".tmp.npy", frame, allow_pickle=False)
+            os.replace(filename + ".tmp.npy", filename)
+
+    def __contains__(self, key):
+        return key in self.frames or (
+            self.directory is not None and os.path.exists(self.filename(key))
+        )
+
+    def get(self, key):
+        """ Return frame for key (or None) """
+
+        if key in self.frames:
+            self.frames.move_to_end(key)
+            self.hits += 1
+            return self.frames[key]
+        if self.directory is not None and os.path.exists(self.filename(key)):
+            frame = np.load(self.filename(key), allow_pickle=False)
+            self.put(key, frame)
+            self.hits += 1
+            return frame
+        self.misses += 1
+        return None
+
+    def put(self, key, frame):
+        self.frames[key] = frame
+        self.frames.move_to_end(key)
+        while len(self.frames) > self.capacity:
+            self.spill(*self.frames.popitem(last=False))
+
+    def flush(self):
+        """ Save all frames in memory on disk """
+
+        for key, frame in self.frames.items():
+            self.spill(key, frame)
+
+
+class CachedAnimation:
+    """
+    Animation whose rendered frames are cached.
+
+    Parameters
+    ----------
+
+    fig : Figure
+        Figure to be animated (it is rendered offscreen)
+    update : function
+        Function called with each frame (as for FuncAnimation)
+    frames : int or iterable
+        Frames (range(frames) if int), cache keys are frame indices
+    state : object, optional
+        JSON serializable description of what frames depend on
+    capacity : int, optional
+        Maximum number of frames kept in memory
+    directory : str, optional
+        Directory where frames are spilled (no disk cache if None)
+    sequential : bool, optional
+        Whether update must be called in order (stateful update)
+    dpi : float, optional
+        Rendering resolution (default to figure dpi)
+    timer : timing.FrameTimer, optional
+        Timer recording update, draw and encode times (without overlay since
+        frames are cached), its report is printed after save and show
+    """
+
+    def __init__(self, fig, update, frames, state=None, capacity=128,
+                 directory=None, sequential=False, dpi=None, timer=None):
+        if isinstance(frames, int):
+            frames = range(frames)
+        self.fig = fig
+        self.update = update
+        self.timer = timer
+        if timer is not None:
+            self.update = timer.wrap(update)
+            fig.draw = timer.timed("draw", fig.draw)
+        self.frames = list(frames)
+        self.sequential = sequential
+        self.dpi = dpi or fig.dpi
+        self.rendered = -1
+
+        description = {
+            "state": state,
+            "size": list(fig.get_size_inches()),
+            "dpi": self.dpi,
+        }
+        description = json.dumps(description, sort_keys=True, default=str)
+        self.hash = hashlib.sha1(description.encode()).hexdigest()[:16]
+        if directory is not None:
+            directory = os.path.join(directory, self.hash)
+        self.cache = FrameCache(capacity, directory)
+        self.canvas = None
+
+    def __len__(self):
+        return len(self.frames)
+
+    def key(self, index):
+        return "%s-%06d" % (self.hash, index)
+
+    def render(self, index):
+        """ Update and draw the figure for frame index, return pixels """
+
+        if self.canvas is None:
+            self.canvas = FigureCanvasAgg(self.fig)
+            self.fig.set_dpi(self.dpi)
+        self.update(self.frames[index])
+        self.rendered = index
+        self.canvas.draw()
+        return np.array(self.canvas.buffer_rgba())
+
+    def frame(self, index):
+        """ Return the (height, width, 4) pixels of frame index """
+
+        pixels = self.cache.get(self.key(index))
+        if pixels is not None:
+            return pixels
+        if self.sequential:
+            if index <= self.rendered:
+                raise RuntimeError(
+                    "Frame %d is not cached and cannot be rendered again "
+                    "(sequential animation without a cache directory)" % index
+                )
+            # Intermediate frames are needed to update the state
+            for i in range(self.rendered + 1, index):
+                self.cache.put(self.key(i), self.render(i))
+        pixels = self.render(index)
+        self.cache.put(self.key(index), pixels)
+        return pixels
+
+    def save(self, filename, fps=30, codec=None, bitrate=None, extra_args=None,
+             progress_callback=None):
+        """
+        Save animation as a movie (e.g. mp4) or an animated GIF (encoded with
+        ffmpeg from cached pixels).
+        """
+
+        if codec is None:
+            codec = "gif" if filename.lower().endswith(".gif") else "h264"
+        height, width = self.frame(0).shape[:2]
+        command = encoder(filename, width, height, fps, codec, bitrate, extra_args)
+        process = subprocess.Popen(command, stdin=subprocess.PIPE)
+        try:
+            for index in range(len(self)):
+                pixels = self.frame(index)
+                if self.timer is None:
+                    process.stdin.write(pixels.tobytes())
+                else:
+                    self.timer.frame = self.frames[index]
+                    with self.timer.phase("encode"):
+                        process.stdin.write(pixels.tobytes())
+                if progress_callback is not None:
+                    progress_callback(index, len(self))
+        finally:
+            process.stdin.close()
+            returncode = process.wait()
+        if returncode != 0:
+            raise RuntimeError("Encoder failed with code %d" % returncode)
+        self.cache.flush()
+        if self.timer is not None:
+            self.timer.close()
+
+    def still(self, index, filename, dpi=None):
+        """
+        Save a single frame. PNG at the animation resolution are saved from
+        cached pixels, other formats (or resolutions) are rendered again.
+        Both go through Figure.savefig (such that it can be redirected).
+        """
+
+        png = os.path.splitext(filename)[1].lower() == ".png"
+        if png and dpi in (None, self.dpi):
+            pixels = self.frame(index)
+            height, width = pixels.shape[:2]
+            fig = Figure(figsize=(width / self.dpi, height / self.dpi), dpi=self.dpi)
+            fig.figimage(pixels)
+            fig.savefig(filename, dpi=self.dpi)
+            return
+        if self.sequential and index != self.rendered:
+            raise RuntimeError("Sequential animation cannot render frame %d again" % index)
+        if self.canvas is None:
+            self.canvas = FigureCanvasAgg(self.fig)
+        self.update(self.frames[index])
+        self.rendered = index
+        self.fig.savefig(filename, dpi=dpi or self.dpi)
+
+    def show(self, interval=20):
+        """ Play cached frames in a new figure, with a slider for scrubbing """
+
+        import matplotlib.pyplot as plt
+        import matplotlib.animation as animation
+        from matplotlib.widgets import Slider
+
+        plt.close(self.fig)
+        pixels = self.frame(0)
+        height, width = pixels.shape[:2]
+        viewer = plt.figure(figsize=(width / 100, height / 100 + 0.25), dpi=100)
+        ratio = 0.25 / (height / 100 + 0.25)
+        ax = viewer.add_axes([0, ratio, 1, 1 - ratio], frameon=False)
+        ax.set_xticks([]), ax.set_yticks([])
+        image = ax.imshow(pixels, interpolation="nearest")
+        slider = Slider(
+            viewer.add_axes([0.1, 0.2 * ratio, 0.8, 0.6 * ratio]),
+            "", 0, len(self) - 1, valinit=0, valstep=1,
+        )
+        slider.on_changed(lambda value: image.set_data(self.frame(int(value))))
+
+        def play(frame):
+            slider.set_val((int(slider.val) + 1) % len(self))
+
+        self.viewer = viewer, slider, animation.FuncAnimation(
+            viewer, play, interval=interval, cache_frame_data=False
+        )
+        plt.show()
+        self.cache.flush()
+        if self.timer is not None:
+            self.timer.close()
+
+
+# -----------------------------------------------------------------------------
+if __name__ == "__main__":
+    import time
+    import tempfile
+    import matplotlib.pyplot as plt
+
+    fig = plt.figure(figsize=(6, 2))
+    ax = fig.add_axes([0, 0, 1, 1])
+    X = np.linspace(-np.pi, np.pi, 256)
+    (line,) = ax.plot(X, np.cos(X))
+    ax.set_ylim(-1.1, 1.1)
+
+    def update(frame):
+        time.sleep(0.01)  # Simulation
+        line.set_ydata(np.cos(X + frame / 10))
+
+    directory = tempfile.mkdtemp()
+    anim = CachedAnimation(fig, update, 100, state={"speed": 10},
+                           capacity=32, directory=directory)
+    for name in ("sine.mp4", "sine.gif"):
+        start = time.perf_counter()
+        anim.save(os.path.join(directory, name))
+        print("%s: %.2fs" % (name, time.perf_counter() - start))
+    anim.still(42, os.path.join(directory, "sine-042.png"))
+    print("Hits: %d, misses: %d" % (anim.cache.hits, anim.cache.misses))
@@ -6,53 +6,40 @@
 import numpy as np
 import matplotlib.pyplot as plt
 import matplotlib.animation as animation
-
-fig = plt.figure(figsize=(8, 4), dpi=100)
+from trails import TrailGrid
+from export import snapshot
+from timing import instrument
 
 frames = 500
 n = 8
 
-X, Y, L = [], [], []
+curves = []
 for row in range(n // 2):
     T2 = np.linspace(0, row * 2 * np.pi, frames) if row > 0 else np.zeros(frames)
 
     for col in range(n):
         T1 = np.linspace(0, col * 2 * np.pi, frames) if col > 0 else np.ones(frames)
+        curves.append(np.stack([np.cos(T1), np.sin(T2)], axis=-1))
 
-        index = n * row + col
-
-        ax = plt.subplot(n // 2, n, 1 + index, aspect=1, frameon=False)
-        ax.set_xlim([-1, +1])
-        ax.set_xticks([])
-        ax.set_ylim([-1, +1])
-        ax.set_yticks([])
-
-        X.append(np.cos(T1))
-        Y.append(np.sin(T2))
-
-        ax.plot(X[-1], Y[-1], color="0.95", clip_on=False, linewidth=0.75)
-        (l,) = ax.plot(
-            [],
-            [],
-            "-o",
-            clip_on=False,
-            markevery=[-1],
-            markeredgewidth=2,
-            markerfacecolor="C0",
-            markeredgecolor="white",
-        )
-        L.append(l)
-
-
-plt.subplots_adjust(left=0.0, bottom=None, right=0.95, top=None)
+# All cells are drawn in a single axes (see trails.py)
+fig = plt.figure(figsize=(8, 4), dpi=100)
+ax = fig.add_axes([0, 0.05, 0.95, 0.9], frameon=False, xticks=[], yticks=[])
+grid = TrailGrid(
+    ax,
+    curves,
+    cols=n,
+    spacing=2.5,
+    head=dict(s=36, linewidth=2, facecolor="C0", edgecolor="white"),
+)
 
 
 def animate(frame):
-    for i in range(len(L)):
-        L[i].set_data(X[i][:frame], Y[i][:frame])
+    artists = grid.update(frame)
     if frame == 150:
-        plt.savefig("../../figures/animation/lissajous.pdf")
+        snapshot(fig, artists, None, "../../figures/animation/lissajous.pdf")
+    return artists
 
 
-ani = animation.FuncAnimation(fig, animate, interval=5, frames=frames)
+animate = instrument(fig, animate, interval=5)
+ani = animation.FuncAnimation(fig, animate, interval=5, frames=frames, blit=True)
 plt.show()
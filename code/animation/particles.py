@@ -0,0 +1,151 @@
+# ----------------------------------------------------------------------------
+# Title:   Scientific Visualisation - Python & Matplotlib
+# Author:  Nicolas P. Rougier
+# License: BSD
+# ----------------------------------------------------------------------------
+# Fixed-capacity particle system sharing its buffers with a scatter plot
+#
+# Particles are stored in the arrays of the collection itself (offsets,
+# sizes and colors): they are set once with the right capacity and then
+# retrieved with the collection getters, such that updating particles (in
+# place) directly updates the collection without any copy or new array.
+# New particles replace the oldest ones (ring buffer) and the evolution of
+# particles is described by rules, i.e. functions operating (in place) on
+# all the particles at once.
+#
+# Usage:
+#
+#   scatter = ax.scatter([], [], facecolors="none")
+#   P = Particles(scatter, 100, rules=[fade(0.01), grow(10)])
+#   ...
+#   P.spawn(position=(0.5, 0.5), size=0, alpha=1)
+#   P.update()
+# ----------------------------------------------------------------------------
+import numpy as np
+
+
+def fade(rate):
+    """ Rule decreasing alpha by rate (down to 0) """
+
+    def rule(particles):
+        alpha = particles.alpha
+        alpha -= rate
+        np.maximum(alpha, 0, out=alpha)
+
+    return rule
+
+
+def grow(rate):
+    """ Rule increasing size by rate (a value or the name of a field) """
+
+    def rule(particles):
+        if isinstance(rate, str):
+            particles.size += particles.fields[rate]
+        else:
+            particles.size += rate
+
+    return rule
+
+
+class Particles:
+    """
+    Fixed-capacity particle system. Position, size (in points^2), color and
+    alpha are views of the collection offsets, sizes and colors.
+
+    Parameters
+    ----------
+
+    collection : PathCollection
+        Collection (e.g. from scatter) whose offsets, sizes and colors are
+        used as particle buffers
+    capacity : int
+        Maximum number of (simultaneous) particles
+    rules : list, optional
+        Functions called with the particle system at each update
+    color : "edge" or "face", optional
+        Which color of the collection is used as particle color
+    fields : dict, optional
+        {name: shape} of additional per-particle fields, e.g. {"growth": ()}
+    """
+
+    def __init__(self, collection, capacity, rules=None, color="edge", fields=None):
+        self.collection = collection
+        self.capacity = capacity
+        self.rules = list(rules or [])
+        self.index = 0
+
+        collection.set_offsets(np.zeros((capacity, 2)))
+        collection.set_sizes(np.zeros(capacity))
+        if color == "edge":
+            collection.set_edgecolors(np.zeros((capacity, 4)))
+        else:
+            collection.set_facecolors(np.zeros((capacity, 4)))
+        # Colors are re-computed (new arrays) the first time the collection
+        # is drawn, unless mapping has already been resolved (the collection
+        # must not be color-mapped).
+        collection.update_scalarmappable()
+        if color == "edge":
+            self.color = collection.get_edgecolor()
+        else:
+            self.color = collection.get_facecolor()
+        self.position = collection.get_offsets()
+        self.size = collection.get_sizes()
+        self.alpha = self.color[:, 3]
+
+        self.fields = {
+            name: np.zeros((capacity, *shape)) for name, shape in (fields or {}).items()
+        }
+
+    def __len__(self):
+        return self.capacity
+
+    def __getitem__(self, name):
+        if name in self.fields:
+            return self.fields[name]
+        return getattr(self, name)
+
+    def spawn(self, count=1, **values):
+        """
+        Replace the count oldest particles with new ones whose fields
+        (position, size, color, alpha or additional fields) are given as
+        keywords (scalar, single value or one value per particle). Return the
+        indices of new particles.
+        """
+
+        index = (self.index + np.arange(count)) % self.capacity
+        self.index = (self.index + count) % self.capacity
+        for name, value in values.items():
+            self[name][index] = value
+        self.collection.stale = True
+        return index
+
+    def update(self):
+        """ Apply rules to all particles """
+
+        for rule in self.rules:
+            rule(self)
+        self.collection.stale = True
+        return self.collection
+
+
+# -----------------------------------------------------------------------------
+if __name__ == "__main__":
+    import time
+    import matplotlib.pyplot as plt
+
+    fig = plt.figure()
+    ax = fig.add_axes([0, 0, 1, 1])
+    scatter = ax.scatter([], [], linewidth=0.5, facecolors="none")
+    n = 100_000
+    P = Particles(scatter, n, rules=[fade(1 / n), grow("growth")], fields={"growth": ()})
+    P.spawn(n, position=np.random.uniform(0, 1, (n, 2)), alpha=np.linspace(0, 1, n),
+            growth=np.random.uniform(0.1, 1, n))
+    position = np.random.uniform(0, 1, (1000, 2))
+
+    start, frames = time.perf_counter(), 1000
+    for frame in range(frames):
+        P.spawn(position=position[frame], size=0, alpha=1)
+        P.update()
+    elapsed = (time.perf_counter() - start) / frames
+    print("%d particles: %.3f ms / update" % (n, 1000 * elapsed))
+    assert scatter.get_offsets() is P.position
@@ -5,7 +5,7 @@
 # ----------------------------------------------------------------------------
 import numpy as np
 import matplotlib.pyplot as plt
-import matplotlib.animation as animation
+import export
 
 fig = plt.figure(figsize=(7, 2))
 ax = plt.subplot()
@@ -23,21 +23,27 @@ def update(frame):
     line1.set_data(X[:frame], C[:frame])
     line2.set_data(X[:frame], S[:frame])
     text.set_text("Frame %d" % frame)
-    if frame in [1, 32, 128, 255]:
-        plt.savefig("../../figures/animation/sine-cosine-frame-%03d.pdf" % frame)
     return line1, line2, text
 
 
 plt.tight_layout()
-writer = animation.FFMpegWriter(fps=30)
-anim = animation.FuncAnimation(fig, update, interval=10, frames=len(X))
+
+# Static background is rendered once and only animated artists are drawn for
+# each frame (see export.py). Snapshots are saved during the export.
 from tqdm.autonotebook import tqdm
 
 bar = tqdm(total=len(X))
-anim.save(
-    "../../figures/animation/sine-cosine.mp4",
-    writer=writer,
+export.save(
+    fig,
+    update,
+    frames=len(X),
+    filename="../../figures/animation/sine-cosine.mp4",
+    fps=30,
     dpi=100,
+    snapshots={
+        frame: "../../figures/animation/sine-cosine-frame-%03d.pdf" % frame
+        for frame in [1, 32, 128, 255]
+    },
     progress_callback=lambda i, n: bar.update(1),
 )
 bar.close()
@@ -0,0 +1,179 @@
+# ----------------------------------------------------------------------------
+# Title:   Scientific Visualisation - Python & Matplotlib
+# Author:  Nicolas P. Rougier
+# License: BSD
+# ----------------------------------------------------------------------------
+# On-disk store of simulation frames (bake then play)
+#
+# A simulation is run once (baked) and each of its fields (e.g. curl, dye,
+# velocity) is streamed into a memory-mapped .npy file (one per field, first
+# axis is the frame index), along with metadata (meta.json). Frames are then
+# read lazily (and can be accessed in any order) such that rendering the
+# animation again (e.g. with another colormap or resolution) does not
+# require to run the simulation again.
+#
+# Usage:
+#
+#   def simulate(frame):
+#       ...
+#       return {"curl": curl, "dye": dye}
+#
+#   store = bake("fluid-store", simulate, 500, metadata={"shape": shape})
+#   curl = store[42]["curl"]
+# ----------------------------------------------------------------------------
+import os
+import sys
+import json
+import shutil
+import numpy as np
+
+
+class Store:
+    """
+    Store of frames made of named fields, each field being a memory-mapped
+    array whose first axis is the frame index.
+    """
+
+    def __init__(self, directory, mode="r"):
+        self.directory = directory
+        with open(os.path.join(directory, "meta.json")) as file:
+            self.meta = json.load(file)
+        self.fields = {
+            name: np.load(os.path.join(directory, name + ".npy"), mmap_mode=mode)
+            for name in self.meta["fields"]
+        }
+
+    @classmethod
+    def create(cls, directory, frames, fields, metadata=None):
+        """
+        Create an empty (incomplete) store.
+
+        Parameters
+        ----------
+
+        directory : str
+            Store directory (replaced if it exists)
+        frames : int
+            Number of frames
+        fields : dict
+            {name: (shape, dtype)} of the fields of a single frame
+        metadata : dict, optional
+            User metadata (JSON serializable)
+        """
+
+        shutil.rmtree(directory, ignore_errors=True)
+        os.makedirs(directory)
+        for name, (shape, dtype) in fields.items():
+            filename = os.path.join(directory, name + ".npy")
+            Z = np.lib.format.open_memmap(
+                filename, mode="w+", dtype=dtype, shape=(frames, *shape)
+            )
+            del Z
+        meta = {
+            "frames": frames,
+            "fields": list(fields),
+            "complete": False,
+            "metadata": metadata or {},
+        }
+        with open(os.path.join(directory, "meta.json"), "w") as file:
+            json.dump(meta, file, indent=1)
+        return cls(directory, mode="r+")
+
+    @property
+    def metadata(self):
+        return self.meta["metadata"]
+
+    @property
+    def complete(self):
+        return self.meta["complete"]
+
+    def __len__(self):
+        return self.meta["frames"]
+
+    def __getitem__(self, index):
+        """ Return the {name: array} fields of a frame (lazily read) """
+
+        return {name: Z[index] for name, Z in self.fields.items()}
+
+    def __setitem__(self, index, fields):
+        for name, value in fields.items():
+            self.fields[name][index] = value
+
+    def close(self):
+        """ Flush data and mark the store as complete """
+
+        for Z in self.fields.values():
+            Z.flush()
+        self.meta["complete"] = True
+        filename = os.path.join(self.directory, "meta.json")
+        with open(filename + ".tmp", "w") as file:
+            json.dump(self.meta, file, indent=1)
+        os.replace(filename + ".tmp", filename)
+
+
+def bake(directory, simulate, frames, metadata=None, force=False, verbose=True):
+    """
+    Run the simulation once and return the (read-only) store of its frames.
+    An existing store is reused if it is complete and has the same metadata.
+
+    Parameters
+    ----------
+
+    directory : str
+        Store directory
+    simulate : function
+        Function called with each frame index (in order) and returning the
+        {name: array} fields of the frame
+    frames : int
+        Number of frames
+    metadata : dict, optional
+        Parameters of the simulation (JSON serializable), used to decide
+        whether an existing store is still valid
+    force : bool, optional
+        Whether to bake even if a valid store exists
+    """
+
+    metadata = json.loads(json.dumps(metadata or {}))
+    if not force and os.path.exists(os.path.join(directory, "meta.json")):
+        store = Store(directory)
+        if store.complete and len(store) == frames and store.metadata == metadata:
+            return store
+
+    fields = simulate(0)
+    store = Store.create(
+        directory,
+        frames,
+        {name: (np.shape(Z), np.asarray(Z).dtype) for name, Z in fields.items()},
+        metadata,
+    )
+    for frame in range(frames):
+        if frame > 0:
+            fields = simulate(frame)
+        store[frame] = fields
+        if verbose:
+            print("Baking frame %d/%d" % (frame + 1, frames), end="\r", file=sys.stderr)
+    if verbose:
+        print(file=sys.stderr)
+    store.close()
+    return Store(directory)
+
+
+# -----------------------------------------------------------------------------
+if __name__ == "__main__":
+    import time
+    import tempfile
+
+    directory = os.path.join(tempfile.mkdtemp(), "store")
+
+    def simulate(frame):
+        time.sleep(0.01)
+        X, Y = np.meshgrid(np.linspace(0, 1, 256), np.linspace(0, 1, 256))
+        return {"Z": np.sin(10 * X + frame / 10).astype(np.float32) * Y}
+
+    start = time.perf_counter()
+    store = bake(directory, simulate, 100, metadata={"frequency": 10})
+    print("Bake:   %.2fs" % (time.perf_counter() - start))
+    start = time.perf_counter()
+    store = bake(directory, simulate, 100, metadata={"frequency": 10})
+    print("Reuse:  %.2fs" % (time.perf_counter() - start))
+    print("Frame 42:", store[42]["Z"].shape, float(store[42]["Z"].mean()))
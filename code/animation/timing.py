@@ -0,0 +1,271 @@
+# ----------------------------------------------------------------------------
+# Title:   Scientific Visualisation - Python & Matplotlib
+# Author:  Nicolas P. Rougier
+# License: BSD
+# ----------------------------------------------------------------------------
+# Frame timing instrumentation for animations
+#
+# Time spent in each phase of a frame is recorded: update (the user
+# function), draw (full figure draw), artists (blitted artists draw), blit
+# and encode (movie writer). The report gives percentiles for each phase, the
+# number of frames whose total time exceeds the frame interval (missed
+# deadlines) and the slowest frames. An overlay (text in the figure corner)
+# can display the timing of the current frame and a JSON trace (Chrome trace
+# event format, see chrome://tracing or https://ui.perfetto.dev) can be saved.
+#
+# Usage:
+#
+#   timer = FrameTimer(interval=10, overlay=True, trace="trace.json")
+#   update = timer.wrap(update)
+#   timer.attach(fig)
+#   anim = animation.FuncAnimation(fig, update, interval=10)
+#
+# or, to only instrument when the ANIMATION_TIMING environment variable is
+# set (its value, if not 1, is the trace filename):
+#
+#   update = instrument(fig, update, interval=10)
+#
+# (see also the timer argument of framecache.CachedAnimation)
+# ----------------------------------------------------------------------------
+import os
+import sys
+import atexit
+import json
+import time
+import contextlib
+import numpy as np
+
+phases = ("update", "draw", "artists", "blit", "encode")
+
+
+class FrameTimer:
+    """
+    Record per frame and per phase times.
+
+    Parameters
+    ----------
+
+    interval : float, optional
+        Frame interval (ms), frames taking longer are counted as missed
+    overlay : bool, optional
+        Whether to display timing in the figure (see wrap)
+    trace : str, optional
+        Filename of the JSON trace, saved with the report when the figure
+        is closed
+    verbose : bool, optional
+        Whether to print the report when the figure is closed
+    """
+
+    def __init__(self, interval=None, overlay=False, trace=None, verbose=True):
+        self.interval = interval
+        self.overlay = overlay
+        self.trace = trace
+        self.verbose = verbose
+        self.events = []
+        self.times = {}
+        self.frame = self.previous = None
+        self.text = None
+        self.closed = False
+        self.start = time.perf_counter()
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """ Record time spent in a phase (of the current frame) """
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - start
+            self.events.append((self.frame, name, start, duration))
+            if self.frame is not None:
+                times = self.times.setdefault(self.frame, {})
+                times[name] = times.get(name, 0) + 1000 * duration
+
+    def timed(self, name, function):
+        """ Return function, recording its time as phase name """
+
+        def wrapper(*args, **kwargs):
+            with self.phase(name):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    def wrap(self, update):
+        """
+        Return an instrumented update function. When overlay is set, the
+        overlay text is updated with the timing of the previous frame and
+        appended to the returned artists (for blitting).
+        """
+
+        def wrapper(frame):
+            self.previous, self.frame = self.frame, frame
+            with self.phase("update"):
+                artists = update(frame)
+            if self.text is not None:
+                self.text.set_text(self.describe())
+                artists = list(artists or []) + [self.text]
+            return artists
+
+        return wrapper
+
+    def attach(self, fig):
+        """ Record figure draws, artists draws and blits of fig """
+
+        fig.draw = self.timed("draw", fig.draw)
+        for ax in fig.axes:
+            ax.draw_artist = self.timed("artists", ax.draw_artist)
+        fig.canvas.blit = self.timed("blit", fig.canvas.blit)
+        # Non interactive backends do not emit close events
+        fig.canvas.mpl_connect("close_event", lambda event: self.close())
+        atexit.register(self.close)
+        if self.overlay:
+            self.text = fig.text(
+                0.99, 0.01, "", ha="right", va="bottom", family="monospace",
+                size="small", color="black", alpha=0.75, zorder=100,
+                bbox=dict(facecolor="white", edgecolor="none", alpha=0.75),
+            )
+
+    def writer(self, writer):
+        """ Record frame grabs of a movie writer (encode phase) """
+
+        writer.grab_frame = self.timed("encode", writer.grab_frame)
+        return writer
+
+    def describe(self):
+        """ Short description of the previous frame """
+
+        # Current frame is only partially recorded
+        frame, times = self.previous, self.times.get(self.previous)
+        if times is None:
+            return ""
+        total = sum(times.values())
+        text = " ".join("%s %.1f" % (name, times[name]) for name in phases if name in times)
+        return "frame %s: %.1f ms (%s)" % (frame, total, text)
+
+    def report(self, slowest=5):
+        """
+        Return a dictionary with percentiles (50, 90, 99 and max) for each
+        phase and the total, missed deadlines and slowest frames.
+        """
+
+        frames = self.times
+        report = {"frames": len(frames), "interval": self.interval, "phases": {}}
+        for name in phases + ("total",):
+            T = np.array([
+                sum(times.values()) if name == "total" else times[name]
+                for times in frames.values()
+                if name == "total" or name in times
+            ])
+            if len(T):
+                report["phases"][name] = {
+                    "p50": float(np.percentile(T, 50)),
+                    "p90": float(np.percentile(T, 90)),
+                    "p99": float(np.percentile(T, 99)),
+                    "max": float(T.max()),
+                }
+        totals = {frame: sum(times.values()) for frame, times in frames.items()}
+        if self.interval is not None:
+            report["missed"] = sum(1 for t in totals.values() if t > self.interval)
+        report["slowest"] = [
+            {"frame": frame, "total": totals[frame], **frames[frame]}
+            for frame in sorted(totals, key=totals.get, reverse=True)[:slowest]
+        ]
+        return report
+
+    def summary(self):
+        """ Human readable report """
+
+        report = self.report()
+        lines = ["%d frames" % report["frames"]]
+        lines.append("%-8s %8s %8s %8s %8s" % ("(ms)", "p50", "p90", "p99", "max"))
+        for name, p in report["phases"].items():
+            lines.append("%-8s %8.2f %8.2f %8.2f %8.2f"
+                         % (name, p["p50"], p["p90"], p["p99"], p["max"]))
+        if "missed" in report:
+            lines.append("Missed deadlines (> %g ms): %d"
+                         % (report["interval"], report["missed"]))
+        lines.append("Slowest frames: " + ", ".join(
+            "%s (%.1f ms)" % (s["frame"], s["total"]) for s in report["slowest"]))
+        return "\n".join(lines)
+
+    def save(self, filename):
+        """ Save trace (Chrome trace event format) and report """
+
+        events = [
+            {
+                "name": name, "ph": "X", "pid": 0, "tid": 0,
+                "ts": 1e6 * (start - self.start), "dur": 1e6 * duration,
+                "args": {"frame": frame},
+            }
+            for frame, name, start, duration in self.events
+        ]
+        with open(filename, "w") as file:
+            json.dump({"traceEvents": events, "report": self.report()}, file, default=str)
+
+    def close(self):
+        """ Print the report and save the trace (if requested), once """
+
+        if self.closed or not self.times:
+            return
+        self.closed = True
+        if self.verbose:
+            print(self.summary(), file=sys.stderr)
+        if self.trace:
+            self.save(self.trace)
+
+
+def from_environment(interval=None, overlay=True):
+    """
+    Return a timer if the ANIMATION_TIMING environment variable is set (its
+    value, if not 1, is the trace filename), else None.
+    """
+
+    value = os.environ.get("ANIMATION_TIMING", "")
+    if value in ("", "0"):
+        return None
+    return FrameTimer(interval, overlay, None if value == "1" else value)
+
+
+def instrument(fig, update, interval=None, overlay=True):
+    """
+    Instrument fig and update if the ANIMATION_TIMING environment variable is
+    set, else return update.
+    """
+
+    timer = from_environment(interval, overlay)
+    if timer is None:
+        return update
+    timer.attach(fig)
+    return timer.wrap(update)
+
+
+# -----------------------------------------------------------------------------
+if __name__ == "__main__":
+    import matplotlib.pyplot as plt
+
+    fig = plt.figure(figsize=(6, 2))
+    ax = fig.add_axes([0, 0, 1, 1])
+    X = np.linspace(-np.pi, np.pi, 256)
+    (line,) = ax.plot(X, np.cos(X), animated=True)
+    ax.set_ylim(-1.1, 1.1)
+
+    def update(frame):
+        time.sleep(0.02 if frame % 10 == 0 else 0.001)  # Slow simulation step
+        line.set_ydata(np.cos(X + frame / 10))
+        return (line,)
+
+    timer = FrameTimer(interval=10, overlay=True)
+    update = timer.wrap(update)
+    timer.attach(fig)
+
+    # Blitting loop (as done by FuncAnimation)
+    fig.canvas.draw()
+    background = fig.canvas.copy_from_bbox(fig.bbox)
+    for frame in range(100):
+        artists = update(frame)
+        fig.canvas.restore_region(background)
+        for artist in artists:
+            ax.draw_artist(artist)
+        fig.canvas.blit(fig.bbox)
+    print(timer.summary())
@@ -0,0 +1,132 @@
+# ----------------------------------------------------------------------------
+# Title:   Scientific Visualisation - Python & Matplotlib
+# Author:  Nicolas P. Rougier
+# License: BSD
+# ----------------------------------------------------------------------------
+# Grid of animated trails in a single axes
+#
+# Instead of one axes and one line per cell, all cells are laid out in a
+# single axes: static curves are gathered in a single (non animated) line
+# collection that is part of the cached background when blitting, moving
+# trails are gathered in a single line collection and heads in a single
+# scatter. Trajectories (including cell offsets) are precomputed in a
+# (cells, frames, 2) array and trails are a single path (cells separated by
+# nan) whose points are only written (or erased) from the previous frame to
+# the current one.
+#
+# Usage:
+#
+#   grid = TrailGrid(ax, curves, cols=8)      # curves: (cells, frames, 2)
+#   def update(frame):
+#       return grid.update(frame)
+#   animation.FuncAnimation(fig, update, frames=frames, blit=True)
+# ----------------------------------------------------------------------------
+import numpy as np
+from matplotlib.collections import LineCollection
+
+
+class TrailGrid:
+    """
+    Grid of animated trails.
+
+    Parameters
+    ----------
+
+    ax : Axes
+        Axes where to draw all the cells (its limits are set accordingly)
+    curves : array-like
+        (cells, frames, 2) trajectories, in cell coordinates ([-1,1]x[-1,1])
+    cols : int
+        Number of columns (cells are laid out row by row, top to bottom)
+    spacing : float, optional
+        Distance between cell centers (in cell coordinates)
+    background : dict or False, optional
+        Line collection keywords for static (full) curves (False to disable)
+    trail : dict, optional
+        Line collection keywords for trails
+    head : dict or False, optional
+        Scatter keywords for heads (False to disable)
+    """
+
+    def __init__(self, ax, curves, cols, spacing=2.5, background=None, trail=None, head=None):
+        curves = np.asarray(curves, dtype=float)
+        count = len(curves)
+        rows = (count + cols - 1) // cols
+        index = np.arange(count)
+        offsets = np.stack([(index % cols) * spacing, -(index // cols) * spacing], -1)
+        self.curves = curves + offsets[:, None, :]
+
+        # Trails points (nan when not yet shown, last one separates cells)
+        self.points = np.full((count, curves.shape[1] + 1, 2), np.nan)
+        self.shown = 0
+
+        self.background = None
+        if background is not False:
+            background = {"color": "0.95", "linewidth": 0.75, **(background or {})}
+            self.background = LineCollection(self.curves, **background)
+            ax.add_collection(self.background)
+        trail = {"color": "C0", **(trail or {})}
+        self.trails = LineCollection([], **trail)
+        ax.add_collection(self.trails)
+        self.artists = [self.trails]
+        self.heads = None
+        if head is not False:
+            head = {"color": "C0", "zorder": 3, **(head or {})}
+            self.heads = ax.scatter(self.curves[:, 0, 0], self.curves[:, 0, 1], **head)
+            self.heads.set_visible(False)
+            self.artists.append(self.heads)
+
+        margin = spacing / 2
+        ax.set_xlim(-margin, (cols - 1) * spacing + margin)
+        ax.set_ylim(-(rows - 1) * spacing - margin, margin)
+        ax.set_aspect(1)
+        for artist in self.artists + [self.background]:
+            if artist is not None:
+                artist.set_clip_on(False)
+
+    def update(self, frame):
+        """ Show trails up to frame and return the modified artists """
+
+        if frame > self.shown:
+            self.points[:, self.shown : frame] = self.curves[:, self.shown : frame]
+        else:
+            self.points[:, frame : self.shown] = np.nan
+        self.shown = frame
+        self.trails.set_segments([self.points.reshape(-1, 2)])
+        if self.heads is not None:
+            self.heads.set_visible(frame > 0)
+            self.heads.set_offsets(self.curves[:, max(frame - 1, 0)])
+        return self.artists
+
+
+# -----------------------------------------------------------------------------
+if __name__ == "__main__":
+    import time
+    import matplotlib.pyplot as plt
+
+    frames, n = 500, 16
+    T = np.linspace(0, 2 * np.pi, frames)
+    curves = np.stack(
+        [
+            np.stack([np.cos(col * T + (col == 0)), np.sin(row * T)], -1)
+            for row in range(n)
+            for col in range(n)
+        ]
+    )
+    fig = plt.figure(figsize=(8, 8))
+    ax = fig.add_axes([0, 0, 1, 1], frameon=False, xticks=[], yticks=[])
+    grid = TrailGrid(ax, curves, cols=n, head=dict(s=10))
+
+    # Blitting: background is drawn once, then only trails and heads
+    for artist in grid.artists:
+        artist.set_animated(True)
+    fig.canvas.draw()
+    background = fig.canvas.copy_from_bbox(fig.bbox)
+    start = time.perf_counter()
+    for frame in range(0, frames, 5):
+        fig.canvas.restore_region(background)
+        for artist in grid.update(frame):
+            ax.draw_artist(artist)
+        fig.canvas.blit(fig.bbox)
+    elapsed = (time.perf_counter() - start) / len(range(0, frames, 5))
+    print("%dx%d grid: %.1f ms / frame" % (n, n, 1000 * elapsed))
@@ -3,8 +3,40 @@
 # Author:  Nicolas P. Rougier
 # License: BSD
 # ----------------------------------------------------------------------------
+# Blue noise (Poisson disk) sampling
+#
+# Bridson's algorithm, vectorized: at each iteration, every active sample
+# (up to a batch size) draws a few candidates at once. Candidates are
+# rejected against existing samples using a background grid (NumPy array of
+# sample coordinates, one sample at most per cell) and against each other (a
+# candidate is rejected by any conflicting candidate with a higher priority).
+# Active samples are retired once k of their candidates have been rejected
+# by existing samples.
+#
+# Variable radius blue noise (e.g. stippling) uses one grid per level of
+# radius (see variable) such that queries stay cheap whatever the range of
+# radius.
+#
+# Large domains are better sampled using precomputed corner Wang tiles (see
+# tiled, tiles are built once and saved in bluenoise-tiles.npz) that are
+# randomly assembled, with rejection only along the domain border.
+#
+# Usage:
+#
+#   import bluenoise
+#   P = bluenoise.generate((width, height), radius=0.1)
+#   P = bluenoise.tiled((width, height), radius=0.1)
+#   P, R = bluenoise.stipple("mona-lisa.png", rmin=0.5, rmax=5)
+# ----------------------------------------------------------------------------
+import os
 import numpy as np
-from math import cos, sin, floor, sqrt, pi, ceil
+
+
+# Offsets of the cells that can hold a sample closer than radius from a
+# point, for a cell size of radius/sqrt(2) (5x5 block without corners)
+offsets = np.array([
+    (dx, dy) for dy in range(-2, 3) for dx in range(-2, 3) if abs(dx) + abs(dy) < 4
+])
 
 
 def generate(shape, radius, k=32, seed=None):
@@ -15,7 +47,7 @@ def generate(shape, radius, k=32, seed=None):
     ----------
 
     shape : tuple
-        Two-dimensional domain (width x height) 
+        Two-dimensional domain (width x height)
     radius : float
         Minimum distance between samples
     k : int, optional
@@ -31,29 +63,6 @@ def generate(shape, radius, k=32, seed=None):
            Siggraph, 2007. :DOI:`10.1145/1278780.1278807`
     """
 
-    def sqdist(a, b):
-        """ Squared Euclidean distance """
-        dx, dy = a[0] - b[0], a[1] - b[1]
-        return dx * dx + dy * dy
-
-    def grid_coords(p):
-        """ Return index of cell grid corresponding to p """
-        return int(floor(p[0] / cellsize)), int(floor(p[1] / cellsize))
-
-    def fits(p, radius):
-        """ Check whether p can be added to the queue """
-
-        radius2 = radius * radius
-        gx, gy = grid_coords(p)
-        for x in range(max(gx - 2, 0), min(gx + 3, grid_width)):
-            for y in range(max(gy - 2, 0), min(gy + 3, grid_height)):
-                g = grid[x + y * grid_width]
-                if g is None:
-                    continue
-                if sqdist(p, g) <= radius2:
-                    return False
-        return True
-
     # When given a seed, we use a private random generator in order to not
     # disturb the default global random generator
     if seed is not None:
@@ -63,33 +72,546 @@ def generate(shape, radius, k=32, seed=None):
     else:
         rng = np.random
 
+    # Candidates per active sample and per iteration, maximum number of
+    # candidates per iteration
+    m, batch = 4, 65536
+
+    width, height = shape
+    cellsize = radius / np.sqrt(2)
+    grid_width = int(np.ceil(width / cellsize))
+    grid_height = int(np.ceil(height / cellsize))
+    radius2 = radius * radius
+
+    # Grid of samples (at most one per cell, inf for empty), padded such that
+    # neighbor cells of any cell are valid
+    grid = np.full((grid_height + 4, grid_width + 4, 2), np.inf)
+    others = np.full(grid.shape[:2], -1)
+
+    def cells(P):
+        """ Padded grid indices (rows, columns) of points P """
+        C = np.floor(P / cellsize).astype(int) + 2
+        np.minimum(C, (grid_width + 1, grid_height + 1), out=C)
+        return C[:, 1], C[:, 0]
+
+    p = rng.uniform(0, shape, 2)
+    row, col = cells(p[None])
+    grid[row, col] = p
+    active = p[None]
+    failures = np.zeros(1, dtype=int)
+
+    while len(active):
+        # Active samples of this iteration
+        n = max(1, batch // m)
+        if len(active) > n:
+            index = rng.permutation(len(active))
+            current, pending = active[index[:n]], active[index[n:]]
+            failed, waiting = failures[index[:n]], failures[index[n:]]
+        else:
+            current, pending = active, active[:0]
+            failed, waiting = failures, failures[:0]
+
+        # Candidates in the annulus [radius, 2*radius] around active samples
+        theta = rng.uniform(0, 2 * np.pi, (len(current), m))
+        r = radius * np.sqrt(rng.uniform(1, 4, (len(current), m)))
+        P = current[:, None] + np.stack([r * np.cos(theta), r * np.sin(theta)], axis=-1)
+        P = P.reshape(-1, 2)
+        parent = np.repeat(np.arange(len(current)), m)
+        valid = (P[:, 0] >= 0) & (P[:, 0] < width) & (P[:, 1] >= 0) & (P[:, 1] < height)
+        P, parent = P[valid], parent[valid]
+        rows, cols = cells(P)
+
+        # Rejection against samples, starting with the (cheap) own cell test
+        valid = np.isinf(grid[rows, cols, 0])
+        P, parent, rows, cols = P[valid], parent[valid], rows[valid], cols[valid]
+        D = grid[rows[:, None] + offsets[:, 1], cols[:, None] + offsets[:, 0]] - P[:, None]
+        valid = ((D * D).sum(axis=-1) > radius2).all(axis=1)
+        P, parent, rows, cols = P[valid], parent[valid], rows[valid], cols[valid]
+
+        # Active samples are retired after k rejected candidates
+        rejected = np.ones(len(current), dtype=bool)
+        rejected[parent] = False
+        failed = failed + m * rejected
+        alive = failed < k
+
+        # Rejection between candidates: one candidate per cell (in random
+        # order), which is rejected if a conflicting candidate comes first
+        order = rng.permutation(len(P))
+        P, rows, cols = P[order], rows[order], cols[order]
+        _, first = np.unique(rows * grid.shape[1] + cols, return_index=True)
+        first.sort()
+        P, rows, cols = P[first], rows[first], cols[first]
+        others[rows, cols] = np.arange(len(P))
+        I = others[rows[:, None] + offsets[:, 1], cols[:, None] + offsets[:, 0]]
+        others[rows, cols] = -1
+        D = P[I] - P[:, None]
+        D = (D * D).sum(axis=-1)
+        valid = ~((I >= 0) & (I < np.arange(len(P))[:, None]) & (D <= radius2)).any(axis=1)
+        P, rows, cols = P[valid], rows[valid], cols[valid]
+
+        grid[rows, cols] = P
+        active = np.concatenate([pending, current[alive], P])
+        failures = np.concatenate([waiting, failed[alive], np.zeros(len(P), dtype=int)])
+
+    grid = grid[2:-2, 2:-2].reshape(-1, 2)
+    return grid[np.isfinite(grid[:, 0])]
+
+
+# Offsets of the cells (of a level of the variable radius grid) that can hold
+# a sample closer than its radius from a point (5x5 block)
+level_offsets = np.array([(dx, dy) for dy in range(-2, 3) for dx in range(-2, 3)])
+inner = np.flatnonzero(np.abs(level_offsets).max(axis=1) <= 1)
+
+
+def variable(shape, radius, k=32, seed=None):
+    """
+    Generate blue noise with a variable radius over a two-dimensional
+    rectangle of size (width, height). Two samples p and q are at least
+    min(radius(p), radius(q)) apart.
+
+    Samples are stored in a multi-level grid: a sample whose radius is in
+    [rmin * s**l, rmin * s**(l+1)) with s = sqrt(2) goes into level l, whose
+    cells (of size rmin * s**l / sqrt(2)) hold at most one sample, such that
+    a query only checks 5x5 cells per level whatever the radius range.
+
+    Parameters
+    ----------
+
+    shape : tuple
+        Two-dimensional domain (width x height)
+    radius : array-like
+        Minimum distance between samples as a 2D array (e.g. an image)
+        covering the domain, first row at the top
+    k : int, optional
+        Limit of samples to choose before rejection (typically k = 30)
+    seed : int, optional
+        If provided, this will set the random seed before generating noise,
+        for valid pseudo-random comparisons.
+
+    Returns
+    -------
+
+    (n, 2) samples and their (n,) radius
+    """
+
+    if seed is not None:
+        from numpy.random.mtrand import RandomState
+
+        rng = RandomState(seed=seed)
+    else:
+        rng = np.random
+
+    # Candidates per active sample and per iteration, maximum number of
+    # candidates per iteration
+    m, batch = 4, 32768
+
     width, height = shape
-    cellsize = radius / sqrt(2)
-    grid_width = int(ceil(width / cellsize))
-    grid_height = int(ceil(height / cellsize))
-    grid = [None] * (grid_width * grid_height)
+    radius = np.asarray(radius, dtype=float)
+    rmin, rmax = radius.min(), radius.max()
+    scale = np.array([radius.shape[1] / width, radius.shape[0] / height])
+    upper = np.array(radius.shape[::-1]) - 1
+
+    def radius_at(P):
+        """ Radius at points P (nearest value) """
+        C = np.minimum((P * scale).astype(int), upper)
+        return radius[upper[1] - C[:, 1], C[:, 0]]
+
+    def level_of(R):
+        """ Level of radius R """
+        return np.minimum((2 * np.log2(R / rmin)).astype(int), levels - 1)
+
+    # Levels are padded grids (2 cells) of sample indices (-1 for empty),
+    # stored in a single flat array such that all levels are queried with a
+    # single gather
+    levels = int(np.floor(2 * np.log2(rmax / rmin))) + 1
+    cellsize = rmin * np.sqrt(2) ** np.arange(levels) / np.sqrt(2)
+    columns = np.ceil(width / cellsize).astype(int) + 4
+    rows = np.ceil(height / cellsize).astype(int) + 4
+    base = np.r_[0, np.cumsum(rows * columns)[:-1]]
+    grid = np.full(np.sum(rows * columns), -1, dtype=np.int32)
+    others = np.full(len(grid), -1, dtype=np.int32)
+    offsets = (level_offsets[:, 1] * columns[:, None] + level_offsets[:, 0]).astype(np.int32)
+    samples = np.empty((1024, 3))
+
+    def cells(P, level):
+        """ Flat cell index of points P in given levels """
+        C = np.floor(P / cellsize[level][..., None]).astype(np.int32) + 2
+        return base[level] + C[..., 1] * columns[level] + C[..., 0]
+
+    def neighbors(P):
+        """ Flat indices of neighbor cells of points P in all levels """
+        index = cells(P[:, None], np.arange(levels))
+        return (index[:, :, None] + offsets).reshape(len(P), offsets.size)
+
+    def close(P, R, neighbors, grid, samples, before=None):
+        """ Whether points P (radius R) are too close to a sample of grid """
+        J = grid[neighbors]
+        if before is not None:
+            J[J >= before[:, None]] = -1
+        i, j = np.nonzero(J >= 0)
+        Q = samples[J[i, j]]
+        D = Q[:, :2] - P[i]
+        result = np.zeros(len(P), dtype=bool)
+        result[i[(D * D).sum(axis=-1) < np.minimum(Q[:, 2], R[i]) ** 2]] = True
+        return result
 
     p = rng.uniform(0, shape, 2)
-    queue = [p]
-    grid_x, grid_y = grid_coords(p)
-    grid[grid_x + grid_y * grid_width] = p
-
-    while queue:
-        qi = rng.randint(len(queue))
-        qx, qy = queue[qi]
-        queue[qi] = queue[-1]
-        queue.pop()
-        for _ in range(k):
-            theta = rng.uniform(0, 2 * pi)
-            r = radius * np.sqrt(rng.uniform(1, 4))
-            p = qx + r * cos(theta), qy + r * sin(theta)
-            if not (0 <= p[0] < width and 0 <= p[1] < height) or not fits(p, radius):
-                continue
-            queue.append(p)
-            gx, gy = grid_coords(p)
-            grid[gx + gy * grid_width] = p
-
-    return np.array([p for p in grid if p is not None])
+    r = radius_at(p[None])
+    grid[cells(p[None], level_of(r))] = 0
+    samples[0] = p[0], p[1], r[0]
+    count = 1
+    active = np.zeros(1, dtype=int)
+    failures = np.zeros(1, dtype=int)
+
+    while len(active):
+        # Active samples of this iteration
+        n = max(1, batch // m)
+        selection = rng.permutation(len(active)) if len(active) > n else np.arange(len(active))
+        current, pending = active[selection[:n]], selection[n:]
+
+        # Candidates in the annulus [r, 2r] around active samples (radius r)
+        theta = rng.uniform(0, 2 * np.pi, (len(current), m))
+        r = samples[current, 2, None] * np.sqrt(rng.uniform(1, 4, (len(current), m)))
+        P = samples[current, None, :2] + np.stack([r * np.cos(theta), r * np.sin(theta)], axis=-1)
+        P = P.reshape(-1, 2)
+        parent = np.repeat(np.arange(len(current)), m)
+        valid = (P[:, 0] >= 0) & (P[:, 0] < width) & (P[:, 1] >= 0) & (P[:, 1] < height)
+        P, parent = P[valid], parent[valid]
+        R = radius_at(P)
+        level = level_of(R)
+        own = cells(P, level)
+
+        # Rejection against samples, starting with the (cheap) own cell test,
+        # then with neighbors of the same level (most rejections) and finally
+        # with neighbors of all levels
+        valid = grid[own] < 0
+        P, R, parent, level, own = P[valid], R[valid], parent[valid], level[valid], own[valid]
+        valid = ~close(P, R, own[:, None] + offsets[level][:, inner], grid, samples)
+        P, R, parent, own = P[valid], R[valid], parent[valid], own[valid]
+        I = neighbors(P)
+        valid = ~close(P, R, I, grid, samples)
+        P, R, parent, I, own = P[valid], R[valid], parent[valid], I[valid], own[valid]
+
+        # Rejection between candidates: one candidate per cell (in random
+        # order), which is rejected if a conflicting candidate comes first
+        order = rng.permutation(len(P))
+        _, first = np.unique(own[order], return_index=True)
+        order = order[np.sort(first)]
+        P, R, parent, I, own = P[order], R[order], parent[order], I[order], own[order]
+        priority = np.arange(len(P), dtype=np.int32)
+        others[own] = priority
+        valid = ~close(P, R, I, others, np.c_[P, R], before=priority)
+        others[own] = -1
+        P, R, parent, own = P[valid], R[valid], parent[valid], own[valid]
+
+        # Active samples are retired after k candidates that were not accepted
+        failed = failures[selection[:n]] + m - np.bincount(parent, minlength=len(current))
+        alive = failed < k
+
+        new = np.arange(count, count + len(P))
+        if count + len(P) > len(samples):
+            samples = np.resize(samples, (2 * (count + len(P)), 3))
+        samples[new] = np.c_[P, R]
+        grid[own] = new
+        count += len(P)
+        active = np.concatenate([active[pending], current[alive], new])
+        failures = np.concatenate([failures[pending], failed[alive], np.zeros(len(P), dtype=int)])
+
+    return samples[:count, :2], samples[:count, 2]
+
+
+def stipple(image, rmin=1.0, rmax=10.0, gamma=1.0, k=32, seed=None):
+    """
+    Stipple an image: the density of samples is proportional to darkness,
+    from radius rmin in black regions up to radius rmax in white regions.
+
+    Parameters
+    ----------
+
+    image : str or array-like
+        Image filename or array (gray, RGB or RGBA) with values in [0, 1]
+    rmin, rmax : float, optional
+        Minimum distance between samples in black and white regions (pixels)
+    gamma : float, optional
+        Gamma applied to darkness
+    k : int, optional
+        Limit of samples to choose before rejection (typically k = 30)
+    seed : int, optional
+        If provided, this will set the random seed before generating noise,
+        for valid pseudo-random comparisons.
+
+    Returns
+    -------
+
+    (n, 2) samples in pixel coordinates (origin at bottom left) and their
+    (n,) radius
+    """
+
+    if isinstance(image, str):
+        import matplotlib.image
+
+        image = matplotlib.image.imread(image)
+    I = np.asarray(image, dtype=float)
+    if I.ndim == 3:
+        I = I[..., :3] @ [0.299, 0.587, 0.114]
+    darkness = (1 - np.clip(I, 0, 1)) ** gamma
+    radius = rmin / np.sqrt(np.maximum(darkness, (rmin / rmax) ** 2))
+    return variable(I.shape[::-1], radius, k, seed)
+
+
+def fill(fixed, inside, lower, upper, rng, k=32):
+    """
+    Unit radius samples in a region (within box lower, upper) that do not
+    conflict with fixed samples. Candidates are drawn around all samples
+    (and uniformly in the box) until k successive iterations fail.
+
+    Parameters
+    ----------
+
+    fixed : array-like
+        (n, 2) fixed samples (possibly outside the region)
+    inside : function
+        Whether points (n, 2) are inside the region
+    lower, upper : array-like
+        Box containing the region
+    rng : RandomState
+        Random generator
+    k : int, optional
+        Number of successive failed iterations before stopping
+
+    Returns
+    -------
+
+    (n, 2) samples inside the region
+    """
+
+    import scipy.spatial
+
+    fixed = np.asarray(fixed, dtype=float).reshape(-1, 2)
+    samples = np.empty((0, 2))
+    failures = 0
+    while failures < k:
+        S = np.concatenate([fixed, samples])
+        theta = rng.uniform(0, 2 * np.pi, (len(S), 4))
+        r = np.sqrt(rng.uniform(1, 4, (len(S), 4)))
+        C = S[:, None] + np.stack([r * np.cos(theta), r * np.sin(theta)], axis=-1)
+        C = np.concatenate([C.reshape(-1, 2), rng.uniform(lower, upper, (64, 2))])
+        C = C[inside(C)]
+        if len(S):
+            distance, _ = scipy.spatial.cKDTree(S).query(C, distance_upper_bound=1)
+            C = C[np.isinf(distance)]
+
+        # Candidate conflicting with a previous one (in random order) is rejected
+        C = C[rng.permutation(len(C))]
+        pairs = scipy.spatial.cKDTree(C).query_pairs(1, output_type="ndarray")
+        valid = np.ones(len(C), dtype=bool)
+        valid[pairs.max(axis=1, initial=0)] = False
+        C = C[valid]
+
+        failures = 0 if len(C) else failures + 1
+        samples = np.concatenate([samples, C])
+    return samples
+
+
+def wang_tiles(size=16, colors=3, seed=0):
+    """
+    Build a complete set of corner Wang tiles of Poisson disk samples (unit
+    radius): tiles are identified by the colors of their four corners and
+    any two tiles whose shared corners have the same colors can be placed
+    side by side without samples closer than the radius.
+
+    Each corner color has its own corner samples (square of side 4 centered
+    on the corner) and each edge has the samples (band of width 2 centered
+    on the edge) of the colors of its two corners. Corner and edge samples
+    are shared with the neighbor tiles such that only the interior of a tile
+    (which is at least one radius away from neighbor interiors) is specific
+    to the tile.
+
+    Parameters
+    ----------
+
+    size : int, optional
+        Tile size (in radius unit)
+    colors : int, optional
+        Number of corner colors, there are colors**4 tiles
+    seed : int, optional
+        Random seed
+
+    Returns
+    -------
+
+    Samples (n, 2) of all tiles and start index of each tile (tile i samples
+    are samples[start[i]:start[i+1]]), tile with corner colors (south-west,
+    south-east, north-west, north-east) being at index
+    ((sw * colors + se) * colors + nw) * colors + ne
+
+    References
+    ----------
+
+    .. [1] An Alternative for Wang Tiles: Colored Edges versus Colored
+           Corners, Ares Lagae and Philip Dutre, ACM Transactions on
+           Graphics, 2006. :DOI:`10.1145/1183287.1183296`
+    """
+
+    from numpy.random.mtrand import RandomState
+
+    rng = RandomState(seed=seed)
+    T = size
+    corners = [
+        fill([], lambda P: np.abs(P).max(axis=1) < 2, (-2, -2), (2, 2), rng)
+        for c in range(colors)
+    ]
+
+    def horizontal(P):
+        return (np.abs(P[:, 1]) < 1) & (P[:, 0] >= 2) & (P[:, 0] < T - 2)
+
+    def vertical(P):
+        return horizontal(P[:, ::-1])
+
+    # Edge samples for each pair of corner colors
+    south = [[fill(np.concatenate([corners[a], corners[b] + (T, 0)]),
+                   horizontal, (2, -1), (T - 2, 1), rng)
+              for b in range(colors)] for a in range(colors)]
+    west = [[fill(np.concatenate([corners[a], corners[b] + (0, T)]),
+                  vertical, (-1, 2), (1, T - 2), rng)
+             for b in range(colors)] for a in range(colors)]
+
+    def interior(P):
+        D = np.minimum(P, T - P)
+        return ((P >= 0) & (P < T)).all(axis=1) & (D.min(axis=1) >= 1) & (D.max(axis=1) >= 2)
+
+    tiles = []
+    for sw in range(colors):
+        for se in range(colors):
+            for nw in range(colors):
+                for ne in range(colors):
+                    P = np.concatenate([
+                        corners[sw], corners[se] + (T, 0),
+                        corners[nw] + (0, T), corners[ne] + (T, T),
+                        south[sw][se], south[nw][ne] + (0, T),
+                        west[sw][nw], west[se][ne] + (T, 0),
+                    ])
+                    P = np.concatenate([P, fill(P, interior, (0, 0), (T, T), rng)])
+                    tiles.append(P[((P >= 0) & (P < T)).all(axis=1)])
+    start = np.cumsum([0] + [len(P) for P in tiles])
+    return np.concatenate(tiles), start
+
+
+# Tile set (samples, start, size, colors) per filename
+tilesets = {}
+
+
+def tileset(filename=None):
+    """
+    Load (or build and save) Wang tiles from filename (default to
+    bluenoise-tiles.npz next to this file).
+    """
+
+    if filename is None:
+        filename = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bluenoise-tiles.npz")
+    if filename not in tilesets:
+        if not os.path.exists(filename):
+            size, colors = 16, 3
+            samples, start = wang_tiles(size, colors)
+            np.savez_compressed(filename, samples=samples.astype(np.float32),
+                                start=start, size=size, colors=colors)
+        with np.load(filename) as data:
+            tilesets[filename] = (data["samples"], data["start"], int(data["size"]), int(data["colors"]))
+    return tilesets[filename]
+
+
+def tiled(shape, radius, seed=None, filename=None):
+    """
+    Generate blue noise over a two-dimensional rectangle of size
+    (width,height) using precomputed Wang tiles: tiles are randomly chosen
+    (according to random corner colors), scaled and assembled over a grid
+    with a random origin and orientation and the result is cropped. There is
+    no rejection but along the border (where the cropping leaves gaps) such
+    that the cost is proportional to the number of samples.
+
+    Parameters
+    ----------
+
+    shape : tuple
+        Two-dimensional domain (width x height)
+    radius : float
+        Minimum distance between samples
+    seed : int, optional
+        If provided, this will set the random seed before generating noise,
+        for valid pseudo-random comparisons.
+    filename : str, optional
+        Tile set (see tileset)
+
+    References
+    ----------
+
+    .. [1] Wang Tiles for Image and Texture Generation, Michael F. Cohen,
+           Jonathan Shade, Stefan Hiller and Oliver Deussen, Siggraph, 2003.
+           :DOI:`10.1145/882262.882265`
+    .. [2] An Alternative for Wang Tiles: Colored Edges versus Colored
+           Corners, Ares Lagae and Philip Dutre, ACM Transactions on
+           Graphics, 2006. :DOI:`10.1145/1183287.1183296`
+    """
+
+    if seed is not None:
+        from numpy.random.mtrand import RandomState
+
+        rng = RandomState(seed=seed)
+    else:
+        rng = np.random
+
+    samples, start, size, colors = tileset(filename)
+    width, height = shape
+
+    # Tiling (in tile units) is randomly rotated and shifted, it covers the
+    # domain rotated back
+    angle = rng.uniform(0, 2 * np.pi)
+    c, s = np.cos(angle), np.sin(angle)
+    rotation = np.array([[c, -s], [s, c]])
+    corners = np.array([[0, 0], [width, 0], [0, height], [width, height]]) @ rotation
+    origin = np.floor(corners.min(axis=0) / (size * radius)) - rng.uniform(0, 1, 2)
+    nx, ny = np.ceil(corners.max(axis=0) / (size * radius) - origin).astype(int)
+
+    # Random colors of grid corners give tile indices
+    C = rng.randint(0, colors, (ny + 1, nx + 1))
+    index = (((C[:-1, :-1] * colors + C[:-1, 1:]) * colors + C[1:, :-1]) * colors + C[1:, 1:]).ravel()
+
+    # Gather samples of all tiles
+    count = (start[1:] - start[:-1])[index]
+    first = np.repeat(start[index] - np.cumsum(count) + count, count)
+    X, Y = np.meshgrid(np.arange(nx), np.arange(ny))
+    offset = np.repeat(np.c_[X.ravel(), Y.ravel()] + origin, count, axis=0)
+    P = (samples[first + np.arange(len(first))] + offset * size) @ rotation.T
+    P = P[((P >= 0) & (P < (width / radius, height / radius))).all(axis=1)]
+
+    # Cropping leaves gaps along the domain border: they are filled with
+    # candidates drawn in a band of one radius (one per cell of a quarter
+    # radius) such that the cost is proportional to the border length
+    import scipy.spatial
+
+    W, H = width / radius, height / radius
+    D = np.minimum(P, (W, H) - P).min(axis=1)
+    S = P[D < 3]
+    x, y, band = np.arange(0, W, 0.25), np.arange(0, H, 0.25), np.arange(0, 1, 0.25)
+    cells = np.concatenate([np.stack(np.meshgrid(u, v), axis=-1).reshape(-1, 2) for u, v in
+                            [(x, band), (x, H - 0.25 - band), (band, y), (W - 0.25 - band, y)]])
+    while True:
+        # Cells covered by a sample are discarded
+        tree = scipy.spatial.cKDTree(S)
+        distance, _ = tree.query(cells + 0.125, distance_upper_bound=1)
+        cells = cells[distance > 1 - 0.125 * np.sqrt(2)]
+        C = cells + rng.uniform(0, 0.25, cells.shape)
+        C = C[((C >= 0) & (C < (W, H))).all(axis=1)]
+        distance, _ = tree.query(C, distance_upper_bound=1)
+        C = C[np.isinf(distance)]
+        C = C[rng.permutation(len(C))]
+        pairs = scipy.spatial.cKDTree(C).query_pairs(1, output_type="ndarray")
+        valid = np.ones(len(C), dtype=bool)
+        valid[pairs.max(axis=1, initial=0)] = False
+        if not valid.any():
+            break
+        S = np.concatenate([S, C[valid]])
+        P = np.concatenate([P, C[valid]])
+    return P * radius
 
 
 # -----------------------------------------------------------------------------
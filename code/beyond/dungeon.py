@@ -71,7 +71,7 @@ h = 4  # Number of line segments composing a hatch
 radius = 0.2  # Minimum radius between points
 # (the smaller, the longer to compute)
 
-P = bluenoise.generate((15, 15), radius=radius) - (0.5, 0.5)
+P = bluenoise.tiled((15, 15), radius=radius) - (0.5, 0.5)
 Walls = np.array(
     [
         [1, 1],
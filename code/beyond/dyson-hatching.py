@@ -26,7 +26,7 @@ def hatch(n=4, theta=None):
 
 
 # Points (blue noise distribution)
-P = bluenoise.generate((10, 10), radius=0.5)
+P = bluenoise.tiled((10, 10), radius=0.5)
 
 # Voronoi cells
 V = scipy.spatial.Voronoi(P)
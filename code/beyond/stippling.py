@@ -0,0 +1,35 @@
+# ----------------------------------------------------------------------------
+# Title:   Scientific Visualisation - Python & Matplotlib
+# Author:  Nicolas P. Rougier
+# License: BSD
+# ----------------------------------------------------------------------------
+# Stippled portraits: samples are spread according to a variable radius blue
+# noise distribution driven by image intensity and rendered with a single
+# scatter, dot diameter being 1.5 times the minimum radius.
+# ----------------------------------------------------------------------------
+import time
+import bluenoise
+import matplotlib.pyplot as plt
+
+fig = plt.figure(figsize=(10, 7.6))
+fig.subplots_adjust(left=0.01, right=0.99, bottom=0.01, top=0.99, wspace=0.02)
+for index, (filename, rmin, rmax) in enumerate(
+    [("../data/mona-lisa.png", 1.4, 14.0), ("../data/John-Hunter.png", 2.1, 21.0)]
+):
+    image = plt.imread(filename)
+    height, width = image.shape[:2]
+    start = time.perf_counter()
+    P, R = bluenoise.stipple(image, rmin, rmax, seed=1)
+    print("%s: %d dots, %.2fs" % (filename, len(P), time.perf_counter() - start))
+
+    ax = fig.add_subplot(1, 2, index + 1, aspect=1, frameon=False)
+    ax.set_xlim(0, width), ax.set_xticks([])
+    ax.set_ylim(0, height), ax.set_yticks([])
+
+    # Dot diameter (points) is 1.5 times the minimum radius (in pixels) such
+    # that dots (almost) cover black regions
+    scale = ax.get_position().width * fig.get_figwidth() * 72 / width
+    ax.scatter(P[:, 0], P[:, 1], s=(1.5 * scale * rmin) ** 2, linewidth=0, color="black")
+
+plt.savefig("../../figures/beyond/stippling.png", dpi=300)
+plt.show()
@@ -0,0 +1,263 @@
+# ----------------------------------------------------------------------------
+# Title:   Scientific Visualisation - Python & Matplotlib
+# Author:  Nicolas P. Rougier
+# License: BSD
+# ----------------------------------------------------------------------------
+# Shared data-fetch layer for scripts that download their data (earthquakes
+# feed, github activity). Downloaded content is kept in a local cache
+# directory and revalidated with the server (ETag / Last-Modified) once it is
+# older than a given time-to-live. Parsed data are stored as typed numpy
+# arrays (.npy) such that reruns do not even need to parse the content.
+#
+# Setting the DATACACHE_OFFLINE environment variable (or offline=True) forbids
+# any network access: cached data is used (even when stale) or an error is
+# raised.
+#
+# Usage (from any chapter directory):
+#
+#   import os, sys
+#   sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+#   import datacache
+#
+#   Z = datacache.array(url, datacache.csv("latitude", "longitude"))
+# ----------------------------------------------------------------------------
+import io
+import os
+import sys
+import json
+import time
+import hashlib
+import threading
+import urllib.error
+import urllib.request
+import numpy as np
+import http.server
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+cache_dir = os.path.join(root, ".cache", "data")
+
+
+def is_offline(offline=None):
+    """ Whether network access is forbidden """
+
+    if offline is None:
+        return os.environ.get("DATACACHE_OFFLINE", "") not in ("", "0")
+    return offline
+
+
+def cache_filename(url, suffix):
+    """ Cache filename for the given url """
+
+    key = hashlib.sha1(url.encode()).hexdigest()[:16]
+    name = os.path.basename(url.split("?")[0]) or "index"
+    return os.path.join(cache_dir, "%s-%s%s" % (name, key, suffix))
+
+
+def _write(filename, content):
+    """ Atomic write of content (bytes) """
+
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+    with open(filename + ".tmp", "wb") as file:
+        file.write(content)
+    os.replace(filename + ".tmp", filename)
+
+
+def fetch(url, ttl=3600, offline=None, timeout=30):
+    """
+    Return the content (bytes) of url, using the local cache if possible.
+
+    Parameters
+    ----------
+
+    url : str
+        URL of the resource
+    ttl : float or None, optional
+        Time (in seconds) during which the cached content is used without
+        revalidation. None means the cached content never expires.
+    offline : bool, optional
+        Whether network access is forbidden (default from DATACACHE_OFFLINE).
+    timeout : float, optional
+        Network timeout (seconds)
+    """
+
+    data_filename = cache_filename(url, ".data")
+    meta_filename = cache_filename(url, ".json")
+    meta = {}
+    if os.path.exists(data_filename) and os.path.exists(meta_filename):
+        with open(meta_filename) as file:
+            meta = json.load(file)
+
+    if meta:
+        age = time.time() - meta["time"]
+        if is_offline(offline) or ttl is None or age < ttl:
+            with open(data_filename, "rb") as file:
+                return file.read()
+    elif is_offline(offline):
+        raise ConnectionError("%s is not cached (offline mode)" % url)
+
+    # Conditional request (revalidation) if we have a cached version
+    request = urllib.request.Request(url)
+    if meta.get("etag"):
+        request.add_header("If-None-Match", meta["etag"])
+    if meta.get("last-modified"):
+        request.add_header("If-Modified-Since", meta["last-modified"])
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            content = response.read()
+            meta = {
+                "url": url,
+                "etag": response.headers.get("ETag"),
+                "last-modified": response.headers.get("Last-Modified"),
+                "sha1": hashlib.sha1(content).hexdigest(),
+            }
+        _write(data_filename, content)
+    except urllib.error.HTTPError as error:
+        if error.code != 304 or not meta:
+            raise
+        with open(data_filename, "rb") as file:
+            content = file.read()
+    except urllib.error.URLError:
+        # Network is not available, stale content is better than nothing
+        if not meta:
+            raise
+        print("%s: using stale cached content" % url, file=sys.stderr)
+        with open(data_filename, "rb") as file:
+            return file.read()
+
+    meta["time"] = time.time()
+    _write(meta_filename, json.dumps(meta).encode())
+    return content
+
+
+def array(url, parse, name=None, ttl=3600, offline=None, timeout=30):
+    """
+    Return the parsed content of url as a numpy array. The parsed array is
+    stored next to the cached content and is only re-computed when the
+    content changes.
+
+    Parameters
+    ----------
+
+    url : str
+        URL of the resource
+    parse : function
+        Function taking content (bytes) and returning a numpy array
+        (structured dtypes are supported but object arrays are not).
+    name : str, optional
+        Name identifying the parser (default is the name of the function)
+
+    Other parameters are the same as for fetch.
+    """
+
+    content = fetch(url, ttl, offline, timeout)
+    name = name or parse.__name__
+    digest = hashlib.sha1(content).hexdigest()[:16]
+    filename = cache_filename(url, "-%s-%s.npy" % (name, digest))
+    if os.path.exists(filename):
+        return np.load(filename, allow_pickle=False)
+
+    Z = np.asarray(parse(content))
+    os.makedirs(cache_dir, exist_ok=True)
+    with open(filename + ".tmp", "wb") as file:
+        np.save(file, Z, allow_pickle=False)
+    os.replace(filename + ".tmp", filename)
+    return Z
+
+
+def csv(*columns):
+    """
+    Return a parser for csv content (with a header line) that reads the given
+    columns in a single pass and returns a structured array.
+    """
+
+    def parse(content):
+        Z = np.genfromtxt(
+            io.BytesIO(content), delimiter=",", names=True, usecols=columns
+        )
+        return np.atleast_1d(Z)
+
+    parse.__name__ = "csv-" + "-".join(columns)
+    return parse
+
+
+class Server:
+    """
+    Local stand-in HTTP server (in a thread) serving {path: content} with
+    ETag support, to be used instead of actual feeds (tests, offline demos).
+
+    Usage:
+
+      with Server({"/data.csv": b"x,y\\n1,2\\n"}) as server:
+          datacache.fetch(server.url + "/data.csv")
+    """
+
+    def __init__(self, files):
+        self.files = files
+        self.requests = []
+
+    def __enter__(self):
+        server = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                content = server.files.get(self.path.split("?")[0])
+                server.requests.append(self.path)
+                if content is None:
+                    self.send_error(404)
+                    return
+                etag = '"%s"' % hashlib.sha1(content).hexdigest()
+                if self.headers.get("If-None-Match") == etag:
+                    self.send_response(304)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("ETag", etag)
+                self.send_header("Content-Length", str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = "http://127.0.0.1:%d" % self.httpd.server_address[1]
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+# -----------------------------------------------------------------------------
+if __name__ == "__main__":
+    import tempfile
+
+    cache_dir = tempfile.mkdtemp()
+    content = b"time,latitude,longitude,depth,mag\n"
+    content += b"2021-01-01,1.0,2.0,10,4.5\n2021-01-02,3.0,4.0,20,5.5\n"
+    parse = csv("latitude", "longitude", "mag")
+
+    with Server({"/feed.csv": content}) as server:
+        url = server.url + "/feed.csv"
+
+        Z = array(url, parse, ttl=0)
+        print("Parsed:", Z.dtype, Z)
+
+        # Expired (ttl=0): revalidation gives a 304 and the snapshot is reused
+        Z = array(url, parse, ttl=0)
+        print("Revalidated: %d requests" % len(server.requests))
+
+        # Not expired: no request at all
+        Z = array(url, parse, ttl=3600)
+        print("Cached: %d requests" % len(server.requests))
+
+        # Offline: no request, even when expired
+        Z = array(url, parse, ttl=0, offline=True)
+        print("Offline: %d requests" % len(server.requests))
+
+    try:
+        fetch(server.url + "/missing.csv", offline=True)
+    except ConnectionError as error:
+        print("Offline:", error)
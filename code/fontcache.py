@@ -0,0 +1,191 @@
+# ----------------------------------------------------------------------------
+# Title:   Scientific Visualisation - Python & Matplotlib
+# Author:  Nicolas P. Rougier
+# License: BSD
+# ----------------------------------------------------------------------------
+# Font bootstrap: register all the fonts shipped in the fonts/ directory and
+# keep the font files resolved for font properties in a project-local cache
+# such that they do not need to be searched (findfont) by each process.
+#
+# Usage (from any chapter directory):
+#
+#   import os, sys
+#   sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+#   import fontcache
+#
+#   fontcache.register()   # Only needed to use project fonts by family name
+#   prop = fontcache.properties("Source Serif Pro")
+#   path = TextPath((0, 0), "Hello", prop=prop)
+# ----------------------------------------------------------------------------
+import os
+import json
+import atexit
+import hashlib
+import matplotlib
+from matplotlib import font_manager
+from matplotlib.font_manager import FontProperties
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+font_dir = os.path.join(root, "fonts")
+cache_dir = os.path.join(root, ".cache")
+
+# Font properties used by TextPath based scripts (text-spiral.py,
+# text-shadow.py, typography-text-path.py). They are resolved to an actual
+# font file once such that TextPath does not need to query the font manager.
+textpath_properties = [
+    dict(family="Source Serif Pro"),
+    dict(family="Source Sans Pro", weight=100),
+    dict(family="Roboto", weight="bold"),
+]
+
+_registered = False
+_properties = {}
+_modified = False
+
+
+def fonts():
+    """ Return the sorted list of font files found in the fonts directory """
+
+    filenames = []
+    for dirname, _, basenames in os.walk(font_dir):
+        for basename in basenames:
+            if os.path.splitext(basename)[1].lower() in (".ttf", ".otf"):
+                filenames.append(os.path.join(dirname, basename))
+    return sorted(filenames)
+
+
+def cache_filename(filenames):
+    """ Return the cache filename for the given font files """
+
+    # The key depends on matplotlib version (font matching might change) and
+    # on the actual font files (name, size and modification time).
+    key = hashlib.sha1(matplotlib.__version__.encode())
+    for filename in filenames:
+        stat = os.stat(filename)
+        relname = os.path.relpath(filename, font_dir)
+        key.update(("%s:%d:%d" % (relname, stat.st_size, stat.st_mtime)).encode())
+    return os.path.join(cache_dir, "fontlist-%s.json" % key.hexdigest()[:16])
+
+
+def register(rebuild=False):
+    """
+    Register all project fonts with the matplotlib font manager and load the
+    resolved font properties from the project-local cache when it is up to
+    date (or resolve and save them otherwise).
+
+    Parameters
+    ----------
+
+    rebuild : bool, optional
+        Whether to ignore any existing cache and rebuild it.
+    """
+
+    global _registered
+    if _registered and not rebuild:
+        return
+
+    # Fonts are added one by one (addfont also registers alternative names)
+    manager = font_manager.fontManager
+    known = set(entry.fname for entry in manager.ttflist)
+    for fname in fonts():
+        if fname not in known:
+            manager.addfont(fname)
+    _registered = True
+
+    filename = cache_filename(fonts())
+    resolved = None
+    if not rebuild and os.path.exists(filename):
+        try:
+            with open(filename) as file:
+                resolved = json.load(file)["properties"]
+        except (ValueError, TypeError, KeyError):
+            resolved = None
+    if resolved is not None:
+        for key, fname in resolved.items():
+            # System fonts are stored with an absolute path
+            fname = os.path.join(font_dir, fname)
+            if os.path.exists(fname):
+                _properties[key] = fname
+    else:
+        _properties.clear()
+        warmup()
+        save()
+
+
+def relative(fname):
+    """ Path relative to the fonts directory if inside, else absolute path """
+
+    fname = os.path.abspath(fname)
+    if os.path.commonpath([font_dir, fname]) == font_dir:
+        return os.path.relpath(fname, font_dir)
+    return fname
+
+
+def save():
+    """ Save resolved properties to the cache """
+
+    global _modified
+    _modified = False
+    cache = {"properties": {}}
+    for key, fname in _properties.items():
+        cache["properties"][key] = relative(fname)
+
+    filename = cache_filename(fonts())
+    os.makedirs(cache_dir, exist_ok=True)
+    with open(filename + ".tmp", "w") as file:
+        json.dump(cache, file, indent=1)
+    os.replace(filename + ".tmp", filename)
+
+
+def flush():
+    """ Save the cache if properties have been resolved since last save """
+
+    if _modified:
+        save()
+
+
+atexit.register(flush)
+
+
+def properties(family, weight="normal", style="normal", size=None):
+    """
+    Return font properties for the given family, weight and style whose font
+    file has been resolved once and for all (and saved in the cache at exit).
+    When the family is not available, the default font is used (with a
+    warning) and is not cached. The returned properties are a new object that
+    can be modified by the caller.
+    """
+
+    global _modified
+    register()
+    key = "%s|%s|%s" % (family, weight, style)
+    if key not in _properties:
+        prop = FontProperties(family=family, weight=weight, style=style)
+        try:
+            fname = font_manager.findfont(prop, fallback_to_default=False)
+        except ValueError:
+            return FontProperties(fname=font_manager.findfont(prop), size=size)
+        _properties[key] = fname
+        _modified = True
+    return FontProperties(fname=_properties[key], size=size)
+
+
+def warmup():
+    """ Resolve the properties used by TextPath based scripts """
+
+    for prop in textpath_properties:
+        properties(**prop)
+
+
+# -----------------------------------------------------------------------------
+if __name__ == "__main__":
+    import time
+
+    start = time.perf_counter()
+    register(rebuild=True)
+    print("Cache rebuilt in %.3fs" % (time.perf_counter() - start))
+    print("  %d font files in %s" % (len(fonts()), font_dir))
+    print("  cache: %s" % cache_filename(fonts()))
+    for prop in textpath_properties:
+        fname = properties(**prop).get_file()
+        print("  %s -> %s" % (prop, os.path.basename(fname)))
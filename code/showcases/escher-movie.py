@@ -1,6 +1,6 @@
 import numpy as np
-import matplotlib.pyplot as plt
 from matplotlib.patches import Polygon
+import movie
 
 
 def line(A, B, thickness=0.005, n=100):
@@ -22,18 +22,13 @@ def line(A, B, thickness=0.005, n=100):
     return np.dstack([np.exp(X) * np.cos(Y), np.exp(X) * np.sin(Y)]).squeeze()
 
 
-n = 250
-X = np.exp(-5 * np.linspace(-1, 1, n, endpoint=True) ** 2)
-A = X * 7 + (1 - X) * 13
-B = X * 3 + (1 - X) * 11
-
-for k, (a, b) in enumerate(zip(A, B)):
+def draw(fig, k):
+    a, b = A[k], B[k]
     y = 2 * np.pi / (a + b * b / a)
     x = b * y / a
     v1, v2 = np.array([x, y]), np.array([-y, x])
 
-    fig = plt.figure(figsize=(8, 8))
-    ax = plt.subplot(1, 1, 1, aspect=1)
+    ax = fig.add_subplot(1, 1, 1, aspect=1)
 
     for i, z in enumerate(np.linspace(0, 1, 3 * 10, endpoint=False)):
         zorder = 0
@@ -62,11 +57,21 @@ for k, (a, b) in enumerate(zip(A, B)):
 
     ax.set_xlim(-np.pi, np.pi), ax.set_xticks([])
     ax.set_ylim(-np.pi, np.pi), ax.set_yticks([])
-    plt.tight_layout()
-    # plt.show()
-    plt.savefig("escher-frame-%03d.png" % k, dpi=100)
-    print("Frame escher-frame-%03d.png" % k)
-    del fig
+    fig.tight_layout()
+
+
+n = 250
+X = np.exp(-5 * np.linspace(-1, 1, n, endpoint=True) ** 2)
+A = X * 7 + (1 - X) * 13
+B = X * 3 + (1 - X) * 11
+
+# Frames are rendered in parallel (see movie.py), the guard allows worker
+# processes (spawn start method) to import this script
+if __name__ == "__main__":
+    movie.render(draw, n, "escher-frame-%03d.png", figsize=(8, 8), dpi=100)
 
-# Encode with (slow):
-# ffmpeg -i escher-frame-%03d.png -framerate 30 -vcodec libvpx-vp9 -b:v 1M output.webm
+    # Encode with (slow):
+    # ffmpeg -i escher-frame-%03d.png -framerate 30 -vcodec libvpx-vp9 -b:v 1M output.webm
+    #
+    # Or render directly as a movie:
+    # movie.render(draw, n, "escher.mp4", figsize=(8, 8), dpi=100)
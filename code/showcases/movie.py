@@ -0,0 +1,136 @@
+# ----------------------------------------------------------------------------
+# Title:   Scientific Visualisation - Python & Matplotlib
+# Author:  Nicolas P. Rougier
+# License: BSD
+# ----------------------------------------------------------------------------
+# Multiprocess frame renderer for offline movies
+#
+# Each frame is drawn by a user function on a new (non pyplot) figure in a
+# pool of worker processes. Figures are not registered with pyplot such that
+# they are freed as soon as the frame has been rendered and the number of
+# frames being rendered (or waiting to be written) is bounded, hence memory
+# usage does not depend on the number of frames. Frames are written in order,
+# either as a sequence of PNG files or piped to ffmpeg.
+#
+# Usage:
+#
+#   def draw(fig, frame):
+#       ax = fig.add_subplot(1, 1, 1)
+#       ...
+#
+#   if __name__ == "__main__":
+#       render(draw, range(250), "frame-%03d.png")   # PNG sequence
+#       render(draw, range(250), "movie.mp4")        # Movie
+#
+# The guard is only needed where worker processes are spawned instead of
+# forked (e.g. Windows) since they import the calling script.
+# ----------------------------------------------------------------------------
+import os
+import sys
+import subprocess
+import contextlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "animation"))
+import export
+
+
+def render_frame(draw, frame, figsize, dpi, filename=None):
+    """
+    Render a single frame and save it to filename if given, else return the
+    raw RGBA buffer (bytes) and its size.
+    """
+
+    fig = Figure(figsize=figsize, dpi=dpi)
+    canvas = FigureCanvasAgg(fig)
+    draw(fig, frame)
+    if filename is not None:
+        fig.savefig(filename, dpi=dpi)
+        return None
+    canvas.draw()
+    return bytes(canvas.buffer_rgba()), canvas.get_width_height()
+
+
+def render(draw, frames, filename, figsize=(8, 8), dpi=100, fps=30, jobs=None,
+           pending=None, codec="h264", bitrate=None, extra_args=None, verbose=True):
+    """
+    Render frames in parallel.
+
+    Parameters
+    ----------
+
+    draw : function
+        Function called as draw(fig, frame) for each frame, it must be
+        defined at module level (such that it can be used by workers).
+    frames : int or iterable
+        Frames to be rendered (range(frames) if int)
+    filename : str
+        Either a filename pattern (e.g. "frame-%03d.png") for a PNG sequence
+        (formatted with the frame index) or a movie filename (e.g. "movie.mp4")
+    figsize : (float, float), optional
+        Figure size (inches)
+    dpi : float, optional
+        Figure resolution
+    fps : float, optional
+        Frames per second (movie only)
+    jobs : int, optional
+        Number of worker processes (default to number of cpus)
+    pending : int, optional
+        Maximum number of frames being rendered or waiting to be written
+        (default to twice the number of jobs)
+    """
+
+    if isinstance(frames, int):
+        frames = range(frames)
+    frames = list(frames)
+    jobs = jobs or os.cpu_count()
+    pending = pending or 2 * jobs
+    sequence = "%" in filename
+
+    # Fork (when available) allows to use functions defined in scripts
+    # without a __main__ guard
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context("fork" if "fork" in methods else None)
+
+    process, futures, index = None, [], 0
+    executor = ProcessPoolExecutor(jobs, mp_context=context)
+    try:
+        for i, frame in enumerate(frames):
+            args = (draw, frame, figsize, dpi, filename % i if sequence else None)
+            futures.append(executor.submit(render_frame, *args))
+
+            # Frames are consumed in order as soon as too many are pending
+            while len(futures) >= pending or (i == len(frames) - 1 and futures):
+                result = futures.pop(0).result()
+                if not sequence:
+                    buffer, (width, height) = result
+                    if process is None:
+                        command = export.encoder(filename, width, height, fps,
+                                                 codec, bitrate, extra_args)
+                        process = subprocess.Popen(command, stdin=subprocess.PIPE)
+                    process.stdin.write(buffer)
+                if verbose:
+                    print("Frame %d/%d" % (index + 1, len(frames)), file=sys.stderr)
+                index += 1
+    except BaseException:
+        # Pending frames are cancelled and the (truncated) movie is removed
+        for future in futures:
+            future.cancel()
+        if process is not None:
+            process.terminate()
+            with contextlib.suppress(OSError):
+                process.stdin.close()
+            process.wait()
+            with contextlib.suppress(OSError):
+                os.remove(filename)
+        raise
+    finally:
+        executor.shutdown()
+
+    if process is not None:
+        process.stdin.close()
+        if process.wait() != 0:
+            raise RuntimeError("Encoder failed with code %d" % process.returncode)
@@ -0,0 +1,822 @@
+# ----------------------------------------------------------------------------
+# Title:   Scientific Visualisation - Python & Matplotlib
+# Author:  Nicolas P. Rougier
+# License: BSD
+# ----------------------------------------------------------------------------
+# Streamline engine
+#
+# Streamlines are integrated for many seeds at once (NumPy arrays), using
+# vectorized bilinear sampling of the velocity field and a fixed step
+# (Euler or fourth order Runge-Kutta) along the normalized field such that
+# points are evenly spaced along each streamline. Each seed is stopped
+# independently (per seed mask) when it leaves the domain, reaches a null
+# velocity, closes a loop or reaches its maximum length. Proximity tests
+# (loops and minimal separation from other streamlines) use a uniform grid
+# spatial hash such that each test is O(1) (expected).
+#
+# Usage:
+#
+#   grid = Grid(X, Y, U, V)
+#   P, count = integrate(grid, seeds, h=0.01, steps=1000)
+#   # streamline k is P[:count[k], k]
+#
+# or, for a set of streamlines covering the whole field:
+#
+#   streamlines = Streamlines(X, Y, U, V).streamlines   # [(x, y), ...]
+#
+# or, for evenly spaced streamlines (as segments of a single collection):
+#
+#   streamlines = evenly_spaced(X, Y, U, V, d_sep=0.05)  # [points, ...]
+#   S, index, length = segments(streamlines)
+#   ax.add_collection(LineCollection(S))
+#
+# or, for an animated flow (colors and widths varying along streamlines):
+#
+#   collection = FlowCollection(streamlines, cmap="Blues_r", levels=32)
+#   ax.add_collection(collection)
+#   collection.set_phase(t)
+# ----------------------------------------------------------------------------
+import numpy as np
+import matplotlib.pyplot as plt
+from matplotlib.collections import LineCollection
+
+
+class Grid:
+    """
+    Regular grid velocity field, X and Y are 1D or 2D (e.g. generated by
+    np.meshgrid) arrays of grid points, U and V are 2D arrays (rows are y).
+    """
+
+    def __init__(self, X, Y, U, V):
+        X, Y = np.asanyarray(X), np.asanyarray(Y)
+        self.x = X if X.ndim == 1 else X[0]
+        self.y = Y if Y.ndim == 1 else Y[:, 0]
+        self.u = np.asarray(U, dtype=float)
+        self.v = np.asarray(V, dtype=float)
+        self.dx = (self.x[-1] - self.x[0]) / (self.x.size - 1)
+        self.dy = (self.y[-1] - self.y[0]) / (self.y.size - 1)
+        # Interleaved velocity such that a single lookup gives (u, v)
+        self.uv = np.stack([self.u, self.v], axis=-1).reshape(-1, 2)
+        ny, nx = self.u.shape
+        self.origin = np.array([self.x[0], self.y[0]])
+        self.scale = 1 / np.array([self.dx, self.dy])
+        self.upper = np.array([nx - 1, ny - 1], dtype=float)
+        self.stride = np.array([1, nx])
+
+    def inside(self, P):
+        """ Whether points P (n, 2) are (strictly) inside the domain """
+
+        x, y = P[:, 0], P[:, 1]
+        return (self.x[0] < x) & (x < self.x[-1]) & (self.y[0] < y) & (y < self.y[-1])
+
+    def indices(self, P):
+        """ Cell indices (i, j) of points P (truncated, as int) """
+
+        i = ((P[:, 0] - self.x[0]) / self.dx).astype(int)
+        j = ((P[:, 1] - self.y[0]) / self.dy).astype(int)
+        return i, j
+
+    def velocity(self, P):
+        """ Bilinear interpolation of velocity at points P (n, 2) """
+
+        nx = self.stride[1]
+        I = (P - self.origin) * self.scale
+        np.fmax(I, 0, out=I)
+        np.minimum(I, self.upper, out=I)
+        # Points on the last row/column use the last cell (with weight 1)
+        I0 = np.minimum(I, self.upper - 1).astype(int)
+        A = I - I0
+        index = I0 @ self.stride
+        a, b = A[:, :1], A[:, 1:]
+        uv = self.uv
+        return ((1 - b) * ((1 - a) * uv[index] + a * uv[index + 1])
+                + b * ((1 - a) * uv[index + nx] + a * uv[index + nx + 1]))
+
+    def direction(self, P):
+        """ Normalized velocity at points P (nan for null velocity) """
+
+        U = self.velocity(P)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            U /= np.hypot(U[:, 0], U[:, 1])[:, None]
+        return U
+
+
+class SpatialHash:
+    """
+    Uniform grid spatial hash of points, with vectorized insertion and
+    queries. Points are bucketed in square cells of given size, cells are
+    stored in a hash table (open addressing, linear probing) and each cell
+    holds a linked list of its points. Points can be inserted in distinct
+    groups (e.g. one per streamline), the group being part of the cell key.
+
+    Parameters
+    ----------
+
+    size : float
+        Cell size, queries are faster for a radius up to size/2
+    capacity : int, optional
+        Initial capacity (number of points), it grows as needed
+    """
+
+    def __init__(self, size, capacity=1024):
+        self.size = size
+        self.count = 0
+        self.offsets = {}
+        self.points = np.empty((capacity, 2))
+        self.keys = np.empty(capacity, dtype=np.int64)
+        self.next = np.empty(capacity, dtype=int)
+        self._table(2 * capacity)
+
+    def __len__(self):
+        return self.count
+
+    def _table(self, size):
+        """ Allocate an empty hash table with (at least) size slots """
+
+        bits = max(int(np.ceil(np.log2(size))), 4)
+        self.shift = np.uint64(64 - bits)
+        self.table = np.full(1 << bits, -1, dtype=np.int64)
+        self.heads = np.full(1 << bits, -1, dtype=int)
+
+    def _key(self, cells, groups):
+        """ Key of integer cells (n, 2) for given groups """
+
+        cells = (cells + (1 << 20)) & ((1 << 21) - 1)
+        return (np.asarray(groups, dtype=np.int64) << 42) | (cells[:, 1] << 21) | cells[:, 0]
+
+    def _slots(self, keys, insert=False):
+        """ Slots of keys (-1 if not found), inserted if not found and insert is set """
+
+        mask = len(self.table) - 1
+        # Mix bits (splitmix64 finalizer) since keys of neighbor cells are
+        # regularly spaced, which would make probe sequences long
+        slot = keys.astype(np.uint64)
+        slot ^= slot >> np.uint64(30)
+        slot *= np.uint64(0xBF58476D1CE4E5B9)
+        slot ^= slot >> np.uint64(27)
+        slot *= np.uint64(0x94D049BB133111EB)
+        slot ^= slot >> np.uint64(31)
+        slot = (slot >> self.shift).astype(int)
+        result = np.full(len(keys), -1)
+        pending = np.arange(len(keys))
+        while len(pending):
+            s = slot[pending]
+            k = self.table[s]
+            found = k == keys[pending]
+            result[pending[found]] = s[found]
+            empty = k == -1
+            if insert:
+                # When several keys claim the same slot, the last one wins
+                # and the others are probed again.
+                self.table[s[empty]] = keys[pending[empty]]
+            advance = ~found & ~empty
+            slot[pending[advance]] = (s[advance] + 1) & mask
+            pending = pending[advance | (empty & insert)]
+        return result
+
+    def _link(self, index, slots):
+        """ Prepend points (index) to the lists of their slots """
+
+        while len(index):
+            # When several points share a slot, the last one wins and the
+            # others are prepended at the next iteration.
+            after = self.heads[slots]
+            self.heads[slots] = index
+            won = self.heads[slots] == index
+            self.next[index[won]] = after[won]
+            index, slots = index[~won], slots[~won]
+
+    def insert(self, P, groups=0):
+        """ Insert points P (n, 2) in given groups (one for all or one per point) """
+
+        P = np.asarray(P, dtype=float).reshape(-1, 2)
+        n, count = len(P), self.count
+        if count + n > len(self.points):
+            capacity = max(2 * len(self.points), count + n)
+            for name in ("points", "keys", "next"):
+                array = getattr(self, name)
+                resized = np.empty((capacity,) + array.shape[1:], dtype=array.dtype)
+                resized[:count] = array[:count]
+                setattr(self, name, resized)
+        index = np.arange(count, count + n)
+        self.points[index] = P
+        self.keys[index] = self._key(np.floor(P / self.size).astype(np.int64), groups)
+        self.count += n
+        if 2 * self.count > len(self.table):
+            # Rehash everything (load factor is kept under 1/2)
+            self._table(4 * self.count)
+            index = np.arange(self.count)
+        self._link(index, self._slots(self.keys[index], insert=True))
+
+    def query(self, P, radius, groups=0):
+        """ Whether there is a point (of given groups) within radius of points P """
+
+        P = np.asarray(P, dtype=float).reshape(-1, 2)
+        n = len(P)
+        # Cells overlapping the (radius) neighborhood of each point
+        lo = np.floor((P - radius) / self.size).astype(np.int64)
+        hi = np.floor((P + radius) / self.size).astype(np.int64)
+        m = int(np.ceil(2 * radius / self.size)) + 1
+        if m not in self.offsets:
+            self.offsets[m] = np.stack(np.meshgrid(np.arange(m), np.arange(m)), -1).reshape(-1, 2)
+        d = self.offsets[m]
+        cells = (lo[:, None] + d).reshape(-1, 2)
+        q = np.repeat(np.arange(n), len(d))
+        valid = (cells <= np.repeat(hi, len(d), axis=0)).all(axis=-1)
+        cells, q = cells[valid], q[valid]
+        if np.ndim(groups):
+            groups = np.asarray(groups)[q]
+        slots = self._slots(self._key(cells, groups))
+        p = np.where(slots >= 0, self.heads[slots], -1)
+
+        # Walk the lists of all cells at once
+        hit = np.zeros(n, dtype=bool)
+        q, p = q[p >= 0], p[p >= 0]
+        while len(p):
+            D = self.points[p] - P[q]
+            hit[q[(D * D).sum(axis=-1) < radius * radius]] = True
+            p = self.next[p]
+            keep = (p >= 0) & ~hit[q]
+            q, p = q[keep], p[keep]
+        return hit
+
+
+def step(field, P, h, method="rk4"):
+    """ Return the points after a step h along field from points P """
+
+    if method == "euler":
+        return P + h * field(P)
+    k1 = field(P)
+    k2 = field(P + h / 2 * k1)
+    k3 = field(P + h / 2 * k2)
+    k4 = field(P + h * k3)
+    return P + h / 6 * (k1 + 2 * k2 + 2 * k3 + k4)
+
+
+def integrate(grid, seeds, h, steps, method="rk4", loops=False, avoid=None,
+              distance=None, callback=None, every=32):
+    """
+    Integrate streamlines from seeds along the normalized velocity field.
+
+    Parameters
+    ----------
+
+    grid : Grid
+        Velocity field
+    seeds : array-like
+        (n, 2) starting points
+    h : float or array-like
+        Step (distance between successive points, negative for backward),
+        for all seeds or for each seed
+    steps : int
+        Maximum number of steps
+    method : "rk4" or "euler", optional
+        Integration method
+    loops : bool, optional
+        Whether to stop streamlines forming a closed loop (or reaching a
+        node), i.e. coming back within 0.9 step of one of their previous
+        points. Points are hashed (SpatialHash) and this is checked every 10
+        steps.
+    avoid : SpatialHash, optional
+        Points (e.g. of other streamlines) streamlines are stopped at when
+        closer than distance (default to avoid.size / 2)
+    distance : float, optional
+        Minimal distance to avoided points
+    callback : function, optional
+        Function called every given steps with (P, count, active) that
+        returns the seeds (indices) to keep active
+    every : int, optional
+        Number of steps between callback calls
+
+    Returns
+    -------
+
+    (steps+1, n, 2) array of points (starting with seeds) and the number of
+    points of each streamline. Points after the end of a streamline are
+    undefined. The last point of a streamline may be outside the domain.
+    """
+
+    seeds = np.asarray(seeds, dtype=float)
+    n = len(seeds)
+    h = np.broadcast_to(np.asarray(h, dtype=float), (n,))[:, None]
+    P = np.empty((steps + 1, n, 2))
+    P[0] = seeds
+    count = np.ones(n, dtype=int)
+    active = np.nonzero(grid.inside(seeds))[0]
+    if loops:
+        radius = 0.9 * np.abs(h).max()
+        # Initial capacity is modest, most streamlines end early
+        visited, inserted = SpatialHash(2 * radius, n * 16), 0
+    if avoid is not None and distance is None:
+        distance = avoid.size / 2
+    for k in range(1, steps + 1):
+        if not len(active):
+            return P[:k], count
+        Q = step(grid.direction, P[k - 1, active], h[active], method)
+        P[k, active] = Q
+        # A null velocity (nan) ends a streamline at its previous point
+        finite = np.isfinite(Q).all(axis=-1)
+        active, Q = active[finite], Q[finite]
+        count[active] += 1
+        keep = grid.inside(Q)
+        if loops and k % 10 == 0:
+            previous = P[inserted:k, active]
+            visited.insert(previous, np.broadcast_to(active, previous.shape[:2]).ravel())
+            inserted = k
+            keep &= ~visited.query(Q, radius, groups=active)
+        if avoid is not None:
+            keep &= ~avoid.query(Q, distance)
+        active = active[keep]
+        if callback is not None and k % every == 0:
+            active = callback(P, count, active)
+    return P, count
+
+
+def evenly_spaced(X, Y, U, V, d_sep, d_test=None, h=None, steps=10000,
+                  min_length=None, seeds=None, streamlines=None, method="rk4"):
+    """
+    Evenly spaced streamlines (Jobard & Lefer, 1997).
+
+    A streamline is started from a seed at least d_sep away from existing
+    streamlines and it is stopped when it comes closer than d_test to them.
+    Candidate seeds are taken at distance d_sep on both sides of the
+    streamlines already placed, such that the field is covered with a
+    (roughly) constant density. At each wave, the next valid candidate of
+    each side of each streamline is integrated (all candidates of a wave
+    are integrated together) and the new streamlines are accepted (and
+    truncated) in order. When no candidate is left, the centers of (d_sep)
+    cells farther than d_sep from all streamlines are used as seeds.
+
+    Parameters
+    ----------
+
+    X, Y, U, V : array-like
+        Velocity field (see Grid)
+    d_sep : float
+        Separation distance (seeds)
+    d_test : float, optional
+        Test distance (streamlines), default to d_sep / 2
+    h : float, optional
+        Integration step (distance between successive points), default to
+        d_test / 2
+    steps : int, optional
+        Maximum number of steps (in each direction)
+    min_length : float, optional
+        Streamlines shorter than min_length are discarded, default to d_sep
+    seeds : array-like, optional
+        (n, 2) first seeds, default to the center of the domain (unless
+        streamlines are given)
+    streamlines : list, optional
+        Streamlines (arrays of points) already placed, they are kept and new
+        streamlines are placed around them
+    method : "rk4" or "euler", optional
+        Integration method
+
+    Returns
+    -------
+
+    List of (n, 2) arrays of points (starting with given streamlines).
+    """
+
+    grid = Grid(X, Y, U, V)
+    d_test = d_sep / 2 if d_test is None else d_test
+    h = d_test / 2 if h is None else h
+    min_length = d_sep if min_length is None else min_length
+    streamlines = [np.asarray(points, dtype=float) for points in streamlines or []]
+    if seeds is None:
+        seeds = [] if streamlines else [[(grid.x[0] + grid.x[-1]) / 2,
+                                         (grid.y[0] + grid.y[-1]) / 2]]
+
+    def neighbors(points):
+        """ Candidate seeds on both sides of a streamline, every d_sep / 2 """
+
+        T = np.gradient(points, axis=0)
+        T /= np.hypot(*T.T)[:, None]
+        every = max(1, int(d_sep / h / 2))
+        Q, N = points[::every], np.stack([-T[::every, 1], T[::every, 0]], -1)
+        return Q + d_sep * N, Q - d_sep * N
+
+    # Points of accepted streamlines
+    placed = SpatialHash(d_test, 1024)
+
+    # Cells (of size d_sep) whose center has already been tried as a seed
+    shape = (int(np.ceil((grid.y[-1] - grid.y[0]) / d_sep)),
+             int(np.ceil((grid.x[-1] - grid.x[0]) / d_sep)))
+    tried = np.zeros(shape, dtype=bool)
+    centers = np.stack(np.meshgrid(
+        grid.x[0] + (np.arange(shape[1]) + 0.5) * d_sep,
+        grid.y[0] + (np.arange(shape[0]) + 0.5) * d_sep), -1).reshape(-1, 2)
+
+    # Candidate seeds (in order) and their parent (side of a streamline)
+    candidates = [np.asarray(seeds, dtype=float).reshape(-1, 2)]
+    parents = [np.arange(len(candidates[0]))]
+    parent = len(candidates[0])
+    for points in streamlines:
+        placed.insert(points)
+        if len(points) > 1:
+            for side in neighbors(points):
+                candidates.append(side)
+                parents.append(np.full(len(side), parent))
+                parent += 1
+    pool, parents = np.concatenate(candidates), np.concatenate(parents)
+
+    while True:
+        # Candidates only become invalid as streamlines are placed
+        valid = grid.inside(pool) & ~placed.query(pool, d_sep)
+        pool, parents = pool[valid], parents[valid]
+        if not len(pool):
+            # Fill the remaining holes (cells are tried only once)
+            free = ~tried.ravel()
+            free[free] = ~placed.query(centers[free], d_sep)
+            tried.ravel()[free] = True
+            pool = centers[free]
+            parents = parent + np.arange(len(pool))
+            parent += len(pool)
+            if not len(pool):
+                break
+
+        # Next candidate of each parent
+        _, first = np.unique(parents, return_index=True)
+        first.sort()
+        seeds = pool[first]
+        remaining = np.ones(len(pool), dtype=bool)
+        remaining[first] = False
+        pool, parents = pool[remaining], parents[remaining]
+
+        n = len(seeds)
+        P, count = integrate(
+            grid, np.concatenate([seeds, seeds]), np.repeat([h, -h], n), steps,
+            method, loops=True, avoid=placed, distance=d_test,
+        )
+        candidates = [pool]
+        for k in range(n):
+            if placed.query(seeds[k], d_sep)[0]:
+                continue
+            forward, backward = P[: count[k], k], P[: count[n + k], n + k][::-1]
+            points = np.concatenate([backward, forward[1:]])
+            # Truncate at streamlines placed before (in the same wave)
+            start = len(backward) - 1
+            near = placed.query(points, d_test) | ~grid.inside(points)
+            after = np.nonzero(near[start:])[0]
+            before = np.nonzero(near[:start])[0]
+            points = points[
+                (before[-1] + 1 if len(before) else 0) :
+                (start + after[0] if len(after) else len(points))
+            ]
+            if len(points) < 2 or np.hypot(*np.diff(points, axis=0).T).sum() < min_length:
+                continue
+            placed.insert(points)
+            streamlines.append(points)
+            for side in neighbors(points):
+                candidates.append(side)
+                parents = np.concatenate([parents, np.full(len(side), parent)])
+                parent += 1
+        pool = np.concatenate(candidates)
+    return streamlines
+
+
+def segments(streamlines):
+    """
+    Flatten streamlines into segments (for a single line collection).
+
+    Returns
+    -------
+
+    (n, 2, 2) segments, (n,) index of the streamline of each segment and
+    (n,) arc length (along its streamline) at the end of each segment.
+    """
+
+    points = [np.asarray(points).reshape(-1, 2) for points in streamlines]
+    S = np.concatenate([np.stack([p[:-1], p[1:]], axis=1) for p in points])
+    index = np.repeat(np.arange(len(points)), [len(p) - 1 for p in points])
+    L = np.hypot(*(S[:, 1] - S[:, 0]).T).cumsum()
+    # Restart arc length at the beginning of each streamline
+    counts = [len(p) - 1 for p in points]
+    start = np.cumsum([0] + counts[:-1])
+    L -= np.repeat(np.r_[0, L][start], counts)
+    return S, index, L
+
+
+class FlowCollection(LineCollection):
+    """
+    Streamlines rendered as a single line collection whose colors and widths
+    depend on the phase (arc length, shifted by set_phase) along each
+    streamline, using a colormap lookup table for all segments at once.
+
+    Parameters
+    ----------
+
+    streamlines : list
+        Streamlines, (n, 2) arrays of points
+    cmap : str or Colormap, optional
+        Colormap (indexed by phase)
+    scale : float, optional
+        Number of phase periods per unit length
+    linewidths : (float, float), optional
+        Line widths at phase 0 and 1
+    offsets : array-like, optional
+        Phase offset of each streamline (default to random)
+    levels : int, optional
+        If None (default), each segment has its own (exact) color and width
+        and streamlines are drawn in order. Else, number of phase levels:
+        segments with the same level are merged into a single path (drawn
+        from the last level to the first), which is much faster to draw and
+        smaller in vector outputs but dense areas are darker since heads of
+        all streamlines are drawn over everything else.
+    **kwargs
+        LineCollection properties (capstyle defaults to round)
+    """
+
+    def __init__(self, streamlines, cmap="Blues_r", scale=1.0, linewidths=(2, 1),
+                 offsets=None, levels=None, **kwargs):
+        streamlines = [np.asarray(p).reshape(-1, 2) for p in streamlines]
+        streamlines = [p for p in streamlines if len(p) > 1]
+        S, self.index, L = segments(streamlines)
+        if offsets is None:
+            offsets = np.random.uniform(0, 1, len(streamlines))
+        self.lengths = scale * (L + np.asarray(offsets)[self.index])
+        # Segment j of streamline k starts at point j + k
+        self.points = np.concatenate(streamlines)
+        self.levels = levels
+        self.widths = linewidths
+        cmap = plt.get_cmap(cmap)
+        self.lut = cmap(np.linspace(0, 1, cmap.N))
+        self.phase = np.empty(len(L))
+
+        kwargs.setdefault("capstyle", "round")
+        super().__init__(S, **kwargs)
+        w0, w1 = linewidths
+        if levels is not None:
+            # A single (compound) path per level, from the last level to the
+            # first such that the head (first level) of dashes is on top
+            P = (np.arange(levels)[::-1] + 0.5) / levels
+            self.set_color(self.lut[(P * len(self.lut)).astype(int)])
+            self.set_linewidth(w0 + (w1 - w0) * P)
+
+            # Shifting the phase by m / levels shifts all levels by m such
+            # that runs of segments are grouped by level (at phase 0) once.
+            Q = np.minimum((np.mod(self.lengths, 1) * levels).astype(int), levels - 1)
+            # Runs of consecutive segments (of a streamline) with same level
+            start = np.flatnonzero(np.r_[
+                True, (Q[1:] != Q[:-1]) | (self.index[1:] != self.index[:-1])
+            ])
+            stop = np.r_[start[1:], len(Q)]
+            level = Q[start]
+            order = np.argsort(level, kind="stable")
+            start, stop, level = start[order], stop[order], level[order]
+            # Points of each run followed by a nan (path break)
+            n = stop - start + 2
+            position = np.arange(n.sum()) - np.repeat(np.cumsum(n) - n, n)
+            I = np.repeat(start + self.index[start], n) + position
+            V = self.points[np.minimum(I, len(self.points) - 1)]
+            V[position == np.repeat(n - 1, n)] = np.nan
+            counts = np.bincount(level, weights=n, minlength=levels)
+            self.runs = np.split(V, np.cumsum(counts[:-1]).astype(int))
+        self.set_phase(0)
+
+    def set_phase(self, phase):
+        """
+        Shift the phase of all streamlines (rounded to a multiple of 1/levels
+        if levels is not None)
+        """
+
+        if self.levels is None:
+            P = self.phase
+            np.add(self.lengths, phase, out=P)
+            np.mod(P, 1, out=P)
+            w0, w1 = self.widths
+            lookup = np.minimum((P * len(self.lut)).astype(int), len(self.lut) - 1)
+            self.set_color(self.lut[lookup])
+            self.set_linewidth(w0 + (w1 - w0) * P)
+        else:
+            # Runs at level q (drawn from the last level to the first) are
+            # the ones at level q - m at phase 0
+            m = int(np.round(phase * self.levels))
+            q = np.arange(self.levels)[::-1]
+            self.set_segments([self.runs[k] for k in (q - m) % self.levels])
+        self.stale = True
+
+
+class Streamlines(object):
+    """
+    Copyright (c) 2011 Raymond Speth.
+
+    Permission is hereby granted, free of charge, to any person obtaining a
+    copy of this software and associated documentation files (the "Software"),
+    to deal in the Software without restriction, including without limitation
+    the rights to use, copy, modify, merge, publish, distribute, sublicense,
+    and/or sell copies of the Software, and to permit persons to whom the
+    Software is furnished to do so, subject to the following conditions:
+
+    The above copyright notice and this permission notice shall be included in
+    all copies or substantial portions of the Software.
+
+    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+    IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+    FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+    AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+    LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+    FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+    DEALINGS IN THE SOFTWARE.
+
+    See: http://web.mit.edu/speth/Public/streamlines.py
+    """
+
+    def __init__(
+        self, X, Y, U, V, res=0.125, spacing=2, maxLen=2500, detectLoops=True,
+        method="rk4", batch=1024,
+    ):
+        """
+        Compute a set of streamlines covering the given velocity field.
+
+        X and Y - 1D or 2D (e.g. generated by np.meshgrid) arrays of the
+                  grid points. The mesh spacing is assumed to be uniform
+                  in each dimension.
+        U and V - 2D arrays of the velocity field.
+        res - Sets the distance between successive points in each
+              streamline (same units as X and Y)
+        spacing - Sets the minimum density of streamlines, in grid points.
+        maxLen - The maximum length of an individual streamline segment.
+        detectLoops - Determines whether an attempt is made to stop extending
+                      a given streamline before reaching maxLen points if
+                      it forms a closed loop or reaches a velocity node.
+        method - Integration method ("rk4" or "euler")
+        batch - Maximum number of streamlines integrated at once
+
+        Streamlines are computed by batches of candidate seeds (first unused
+        grid point and first unused grid point of each block of the grid, in
+        scan order). A candidate streamline is kept if its seed has not been
+        used by the previous ones (of the same batch).
+        """
+
+        self.spacing = spacing
+        self.detectLoops = detectLoops
+        self.maxLen = maxLen
+        self.res = res
+        self.method = method
+        self.batch = batch
+
+        self.grid = Grid(X, Y, U, V)
+        self.x, self.y = self.grid.x, self.grid.y
+        self.u, self.v = self.grid.u, self.grid.v
+        self.dx, self.dy = self.grid.dx, self.grid.dy
+        self.dr = self.res * np.sqrt(self.dx * self.dy)
+
+        # marker for which regions have contours
+        self.used = np.zeros(self.u.shape, dtype=bool)
+        self.used[0] = True
+        self.used[-1] = True
+        self.used[:, 0] = True
+        self.used[:, -1] = True
+
+        # Don't try to compute streamlines in regions where there is no velocity data
+        self.used |= (self.u == 0) & (self.v == 0)
+
+        # Make the streamlines
+        self.streamlines = []
+        self.first = 0
+        while self._advance():
+            seeds = self._candidates()
+            for (j, i), streamline, points in self._makeStreamlines(seeds):
+                if not self.used[j, i]:
+                    self._mark(points)
+                    self.streamlines.append(streamline)
+
+    def _advance(self, chunk=4096):
+        """
+        Move the scan pointer (first) to the first unused grid point and
+        return whether there is one. Since grid points are never released,
+        the pointer only moves forward (each grid point is scanned once).
+        """
+
+        used = self.used.ravel()
+        while self.first < used.size:
+            window = used[self.first : self.first + chunk]
+            k = window.argmin()
+            if not window[k]:
+                self.first += k
+                return True
+            self.first += len(window)
+            chunk *= 2
+        return False
+
+    def _candidates(self):
+        """
+        Candidate seeds: first unused grid point and, in scan order, the
+        first unused grid point of the next blocks of the grid. Only the
+        bands of blocks needed to get a batch are scanned.
+        """
+
+        ny, nx = self.used.shape
+        size = max(4 * self.spacing, 8)
+        start = self.first // nx // size * size
+        candidates, count = [], 0
+        for row in range(start, ny, size):
+            band = np.transpose(np.logical_not(self.used[row : row + size]).nonzero())
+            _, first = np.unique(band[:, 1] // size, return_index=True)
+            first.sort()
+            band = band[first[: self.batch - count]]
+            band[:, 0] += row
+            candidates.append(band)
+            count += len(band)
+            if count >= self.batch:
+                break
+        # Since all grid points before the first unused one are used, the
+        # first candidate is the first unused grid point.
+        return np.concatenate(candidates)
+
+    def _makeStreamlines(self, seeds):
+        """
+        Compute streamlines extending in both directions from the given grid
+        points (forward and backward halves are integrated together) and
+        return a list of (seed, (x, y), evaluated) where evaluated are the
+        points where velocity has been evaluated.
+
+        Candidates are integrated by chunks of steps and a candidate is
+        dropped as soon as its seed is claimed by (the partial streamline
+        of) a previous candidate, such that most of the streamlines that
+        would be discarded are not integrated until their end.
+        """
+
+        n = len(seeds)
+        P0 = np.stack([self.x[seeds[:, 1]], self.y[seeds[:, 0]]], axis=-1)
+        h = np.repeat([+self.dr, -self.dr], n)
+        steps = int(self.maxLen / 2) + 1
+        ny, nx = self.used.shape
+        owner = np.full(ny * nx, n)
+        claimed = np.ones(2 * n, dtype=int)
+        alive = np.ones(n, dtype=bool)
+
+        # A seed is claimed by a cell if it is in the (spacing x spacing)
+        # grid points around the cell, i.e. if the cell is in the window
+        # of cells preceding the seed.
+        d = np.arange(self.spacing)
+        J = np.maximum(seeds[:, 0, None, None] - d[:, None], 0)
+        I = np.maximum(seeds[:, 1, None, None] - d, 0)
+        window = (J * nx + I).reshape(n, -1)
+
+        def claim(P, count, active):
+            # Cells of new points are claimed by the (lowest) candidate
+            # reaching them and candidates whose seed has been claimed by a
+            # previous candidate are dropped.
+            halves = np.nonzero(count > claimed)[0]
+            halves = halves[alive[halves % n]]
+            points = [P[claimed[k] - 1 : count[k] - 1, k] for k in halves]
+            index = np.repeat(halves % n, [len(p) for p in points])
+            if len(index):
+                np.minimum.at(owner, self._cells(np.concatenate(points)), index)
+            claimed[halves] = count[halves]
+            alive[owner[window].min(axis=1) < np.arange(n)] = False
+            return active[alive[active % n]]
+
+        P, count = integrate(
+            self.grid, np.concatenate([P0, P0]), h, steps, self.method,
+            self.detectLoops, callback=claim,
+        )
+        streamlines = []
+        for k in np.nonzero(alive)[0]:
+            forward, backward = P[: count[k], k], P[: count[n + k], n + k][::-1]
+            points = np.concatenate([backward, forward[1:]])
+            # Velocity is evaluated at every point but the last ones
+            evaluated = np.concatenate([backward[1:], forward[:-1]])
+            streamlines.append((seeds[k], (points[:, 0], points[:, 1]), evaluated))
+        return streamlines
+
+    def _cells(self, points):
+        """ Flat indices of the cells of points """
+
+        i, j = self.grid.indices(points)
+        return j * self.used.shape[1] + i
+
+    def _mark(self, points):
+        """ Mark grid points around (the cells of) points as used """
+
+        ny, nx = self.used.shape
+        j, i = np.divmod(np.unique(self._cells(points)), nx)
+        # Grid points beyond the last row/column are clipped to the (already
+        # used) border instead of being discarded.
+        d = np.arange(self.spacing)
+        J = np.minimum(j[:, None, None] + d[:, None], ny - 1)
+        I = np.minimum(i[:, None, None] + d, nx - 1)
+        self.used[J, I] = True
+
+
+# -----------------------------------------------------------------------------
+if __name__ == "__main__":
+    import time
+
+    for n in (100, 1000):
+        Y, X = np.mgrid[-3:3:n * 1j, -3:3:n * 1j]
+        U, V = -1 - X ** 2 + Y, 1 + X - X * Y ** 2
+        start = time.perf_counter()
+        s = Streamlines(X, Y, U, V)
+        elapsed = time.perf_counter() - start
+        points = sum(len(x) for x, y in s.streamlines)
+        print("%dx%d field: %d streamlines, %d points, %.2fs"
+              % (n, n, len(s.streamlines), points, elapsed))
+
+        start = time.perf_counter()
+        S, index, length = segments(evenly_spaced(X, Y, U, V, d_sep=0.05))
+        elapsed = time.perf_counter() - start
+        print("%dx%d field: %d evenly spaced streamlines, %d segments, %.2fs"
+              % (n, n, index[-1] + 1, len(S), elapsed))
@@ -9,10 +9,15 @@ from matplotlib.textpath import TextPath
 from matplotlib.patches import PathPatch
 from matplotlib.collections import PolyCollection
 from matplotlib.font_manager import FontProperties
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import fontcache
 
 red = np.array([233, 77, 85, 255]) / 255
 darkred = np.array([130, 60, 71, 255]) / 255
-prop = FontProperties(family="Source Sans Pro", weight=100)
+prop = fontcache.properties("Source Sans Pro", weight=100)
 
 fig = plt.figure(figsize=(14.8 / 2.54, 21 / 2.54))
 
@@ -9,6 +9,11 @@ from matplotlib.patches import PathPatch
 from matplotlib.textpath import TextPath
 from matplotlib.collections import PolyCollection
 from matplotlib.font_manager import FontProperties
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import fontcache
 
 n = 100
 A = np.linspace(np.pi, n * 2 * np.pi, 10_000)
@@ -27,7 +32,7 @@ import mpmath
 mpmath.mp.dps = 15000
 text = str(mpmath.pi)
 
-path = TextPath((0, 0), text, size=6, prop=FontProperties(family="Source Serif Pro"))
+path = TextPath((0, 0), text, size=6, prop=fontcache.properties("Source Serif Pro"))
 path.vertices.setflags(write=1)
 Vx, Vy = path.vertices[:, 0], path.vertices[:, 1]
 X = np.interp(Vx, L, T[:, 0]) + Vy * np.interp(Vx, L, O[:, 0])
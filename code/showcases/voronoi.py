@@ -0,0 +1,253 @@
+# ----------------------------------------------------------------------------
+# Title:   Scientific Visualisation - Python & Matplotlib
+# Author:  Nicolas P. Rougier
+# License: BSD
+# ----------------------------------------------------------------------------
+# Recursive Voronoi subdivision of a convex polygon
+#
+# Polygons are stored as padded arrays (n, m, 2) together with their number
+# of vertices (n,) such that all the polygons of a level are processed at
+# once. The Voronoi cell of a point inside a convex polygon is the polygon
+# clipped by the bisectors between this point and the other points of the
+# polygon: cells are thus computed by clipping (Sutherland-Hodgman) all the
+# cells of a level by one half-plane at a time, without building the Voronoi
+# diagram and without any other clipping since cells are convex. Top-level
+# cells are subdivided in parallel (worker processes).
+#
+# Usage:
+#
+#   import voronoi
+#   polygons, depth, parent = voronoi.subdivide(square, [11, 10, 9, 8, 7])
+#   collection = PolyCollection(polygons)
+# ----------------------------------------------------------------------------
+import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+
+def clip(P, count, a, b):
+    """
+    Clip convex polygons by half-planes (Sutherland-Hodgman).
+
+    Parameters
+    ----------
+
+    P : ndarray
+        (n, m, 2) polygons, only the first count vertices are used
+    count : ndarray
+        (n,) number of vertices of each polygon
+    a, b : ndarray
+        (n, 2) and (n,) half-planes a.x <= b
+
+    Returns
+    -------
+
+    (n, m', 2) clipped polygons and their (n,) number of vertices
+    """
+
+    # Only polygons with a vertex outside of their half-plane are clipped
+    m = P.shape[1]
+    index = np.arange(m)
+    valid = index < count[:, None]
+    dP = np.einsum("nmk,nk->nm", P, a) - b[:, None]
+    clipped = np.nonzero(((dP > 0) & valid).any(axis=1))[0]
+    if not len(clipped):
+        return P, count
+    n, rows = len(clipped), np.arange(len(clipped))[:, None]
+    S, dP, valid = P[clipped], dP[clipped], valid[clipped]
+    following = (index + 1) % np.maximum(count[clipped], 1)[:, None]
+    Q, dQ = S[rows, following], dP[rows, following]
+
+    # Each edge gives its first vertex (if inside) and its intersection with
+    # the half-plane boundary (if crossing)
+    inside = dP <= 0
+    crossing = inside != (dQ <= 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t = dP / (dP - dQ)
+        V = np.stack([S, S + t[..., None] * (Q - S)], axis=2).reshape(n, 2 * m, 2)
+    keep = (np.stack([inside, crossing], axis=2) & valid[..., None]).reshape(n, 2 * m)
+    position = np.cumsum(keep, axis=1) - 1
+    width = position[:, -1].max() + 1
+    if width > m:
+        P = np.concatenate([P, np.zeros((len(P), width - m, 2))], axis=1)
+    else:
+        P = P.copy()
+    count = count.copy()
+    i, j = np.nonzero(keep)
+    P[clipped[i], position[i, j]] = V[i, j]
+    count[clipped] = position[:, -1] + 1
+    return P, count
+
+
+def sample(P, count, n, rng, candidates=8):
+    """
+    Well spaced points inside convex polygons: n points are chosen (farthest
+    point sampling) among n * candidates uniformly distributed points.
+
+    Parameters
+    ----------
+
+    P : ndarray
+        (k, m, 2) polygons, only the first count vertices are used
+    count : ndarray
+        (k,) number of vertices of each polygon
+    n : int
+        Number of points per polygon
+    rng : Generator
+        Random generator
+    candidates : int, optional
+        Number of candidates per point
+
+    Returns
+    -------
+
+    (k, n, 2) points
+    """
+
+    k, m = P.shape[:2]
+    rows = np.arange(k)[:, None]
+
+    # Uniform candidates in the fan of triangles (first vertex, i, i+1)
+    A, B, C = P[:, :1], P[:, 1:-1], P[:, 2:]
+    U, V = B - A, C - A
+    area = np.abs(U[..., 0] * V[..., 1] - U[..., 1] * V[..., 0])
+    area *= np.arange(1, m - 1) < (count - 1)[:, None]
+    cumulative = np.cumsum(area, axis=1)
+    u = rng.uniform(0, 1, (k, n * candidates)) * cumulative[:, -1:]
+    T = np.minimum((cumulative[:, None, :] <= u[..., None]).sum(axis=-1), m - 3)
+    r1 = np.sqrt(rng.uniform(0, 1, (k, n * candidates, 1)))
+    r2 = rng.uniform(0, 1, (k, n * candidates, 1))
+    X = (1 - r1) * A + r1 * (1 - r2) * B[rows, T] + r1 * r2 * C[rows, T]
+
+    # Farthest point sampling
+    points = [X[:, 0]]
+    D = ((X - X[:, :1]) ** 2).sum(axis=-1)
+    for i in range(1, n):
+        S = X[rows[:, 0], D.argmax(axis=1)]
+        points.append(S)
+        D = np.minimum(D, ((X - S[:, None]) ** 2).sum(axis=-1))
+    return np.stack(points, axis=1)
+
+
+def split(P, count, n, rng):
+    """
+    Voronoi cells of n points sampled in each polygon, cells of polygon i
+    being at index i*n to (i+1)*n.
+    """
+
+    X = sample(P, count, n, rng)
+    cells, cells_count = np.repeat(P, n, axis=0), np.repeat(count, n)
+    Xi = X.reshape(-1, 2)
+
+    # Bisectors with nearest points first such that cells shrink quickly and
+    # most of the farthest bisectors do not clip anything
+    D = ((X[:, :, None] - X[:, None, :]) ** 2).sum(axis=-1)
+    nearest = np.argsort(D, axis=-1)[..., 1:].reshape(-1, n - 1)
+    Xj = X.reshape(-1, 2)[nearest + (np.arange(len(Xi)) // n * n)[:, None]]
+    for k in range(n - 1):
+        a, b = 2 * (Xj[:, k] - Xi), (Xj[:, k] ** 2).sum(axis=-1) - (Xi ** 2).sum(axis=-1)
+        cells, cells_count = clip(cells, cells_count, a, b)
+    return cells, cells_count
+
+
+def subtree(P, count, points, seed):
+    """
+    Recursive subdivision of polygons, returning cells, count and parent
+    (index in the previous level) of each level.
+    """
+
+    rng = np.random.default_rng(seed)
+    levels = []
+    for n in points:
+        P, count = split(P, count, n, rng)
+        levels.append((P, count, np.arange(len(P)) // n))
+    return levels
+
+
+def pad(P, count, m):
+    """ Pad polygons to m vertices by repeating their last vertex """
+
+    index = np.minimum(np.arange(m), np.maximum(count, 1)[:, None] - 1)
+    return P[np.arange(len(P))[:, None], index]
+
+
+def subdivide(polygon, points, jobs=None, seed=None):
+    """
+    Recursive Voronoi subdivision of a convex polygon: points are sampled
+    in the polygon, each Voronoi cell (clipped by the polygon) is subdivided
+    the same way and so on.
+
+    Parameters
+    ----------
+
+    polygon : array-like
+        (m, 2) convex polygon
+    points : sequence of int
+        Number of points (cells) per subdivision at each level
+    jobs : int, optional
+        Number of worker processes subdividing top-level cells (default to
+        the number of CPUs available to this process)
+    seed : int, optional
+        Random seed, results do not depend on the number of jobs
+
+    Returns
+    -------
+
+    (n, m, 2) cells (padded by repeating their last vertex) of all levels
+    (level by level), their (n,) depth (0 for the top-level cells) and (n,)
+    parent index (-1 for the top-level cells)
+    """
+
+    P = np.asarray(polygon, dtype=float)[None]
+    count = np.array([P.shape[1]])
+    sequence = np.random.SeedSequence(seed)
+    P, count = split(P, count, points[0], np.random.default_rng(sequence))
+
+    # Top-level cells are subdivided independently (one seed each)
+    args = [(P[i : i + 1], count[i : i + 1], points[1:], s)
+            for i, s in enumerate(sequence.spawn(len(P)))]
+    if not jobs:
+        # CPUs this process may run on (e.g. restricted by affinity)
+        if hasattr(os, "sched_getaffinity"):
+            jobs = len(os.sched_getaffinity(0))
+        else:
+            jobs = os.cpu_count() or 1
+    if jobs > 1 and len(points) > 1:
+        # Fork (when available) allows to use this module from scripts
+        # without a __main__ guard
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context("fork" if "fork" in methods else None)
+        with ProcessPoolExecutor(jobs, mp_context=context) as executor:
+            trees = list(executor.map(subtree, *zip(*args)))
+    else:
+        trees = [subtree(*arg) for arg in args]
+
+    # Cells are ordered by level and then by top-level cell, sizes and
+    # offsets are used to make parent indices global
+    sizes = np.array([[1] + [len(cells) for cells, _, _ in tree] for tree in trees])
+    offset = np.cumsum(sizes, axis=0) - sizes
+    start = np.cumsum(sizes.sum(axis=0)) - sizes.sum(axis=0)
+    m = max([P.shape[1]] + [cells.shape[1] for tree in trees for cells, _, _ in tree])
+    polygons, depth, parent = [pad(P, count, m)], [np.zeros(len(P), int)], [np.full(len(P), -1)]
+    for level in range(1, len(points)):
+        for i, tree in enumerate(trees):
+            cells, count, local = tree[level - 1]
+            polygons.append(pad(cells, count, m))
+            depth.append(np.full(len(cells), level))
+            parent.append(start[level - 1] + offset[i, level - 1] + local)
+    return np.concatenate(polygons), np.concatenate(depth), np.concatenate(parent)
+
+
+# -----------------------------------------------------------------------------
+if __name__ == "__main__":
+    import time
+
+    square = 100 * np.array([[-1, -1], [-1, 1], [1, 1], [1, -1]])
+    for points in ([11, 10, 9, 8, 7], [11, 10, 9, 8, 7, 6]):
+        for jobs in (1, os.cpu_count()):
+            start = time.perf_counter()
+            polygons, depth, parent = subdivide(square, points, jobs=jobs, seed=1)
+            elapsed = time.perf_counter() - start
+            print("%d levels, %d cells, %d job(s): %.2fs"
+                  % (len(points), len(polygons), jobs, elapsed))
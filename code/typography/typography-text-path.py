@@ -9,6 +9,11 @@ import matplotlib.pyplot as plt
 from matplotlib.textpath import TextPath
 from matplotlib.patches import PathPatch
 from matplotlib.font_manager import FontProperties
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import fontcache
 
 
 def interpolate(X, Y, T):
@@ -23,7 +28,7 @@ def contour(X, Y, text, offset=0):
     # Interpolate text along curve
     # X0,Y0 for position  + X1,Y1 for normal vectors
     path = TextPath(
-        (0, -0.75), text, prop=FontProperties(size=2, family="Roboto", weight="bold")
+        (0, -0.75), text, prop=fontcache.properties("Roboto", weight="bold", size=2)
     )
     V = path.vertices
     X0, Y0, D = interpolate(X, Y, offset + V[:, 0])
@@ -3,33 +3,34 @@
 # Author:  Nicolas P. Rougier
 # License: BSD
 # ----------------------------------------------------------------------------
-import urllib
+import os
+import sys
 import numpy as np
 import cartopy
 import matplotlib.pyplot as plt
 from datetime import datetime
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import datacache
+
 
 # -> http://earthquake.usgs.gov/earthquakes/feed/v1.0/csv.php
 feed = "http://earthquake.usgs.gov/earthquakes/feed/v1.0/summary/"
 
 # Significant earthquakes in the past 30 days
-# url = urllib.request.urlopen(feed + "significant_month.csv")
+# url = feed + "significant_month.csv"
 
 # Earthquakes of magnitude > 4.5 in the past 30 days
-url = urllib.request.urlopen(feed + "4.5_month.csv")
+url = feed + "4.5_month.csv"
 
 # Earthquakes of magnitude > 2.5 in the past 30 days
-# url = urllib.request.urlopen(feed + "2.5_month.csv")
+# url = feed + "2.5_month.csv"
 
 # Earthquakes of magnitude > 1.0 in the past 30 days
-# url = urllib.request.urlopen(feed + "1.0_month.csv")
+# url = feed + "1.0_month.csv"
 
-# Read data
-data = (url.read().decode()).split("\n")
-E = np.genfromtxt(
-    data, delimiter=",", names=True, usecols=("latitude", "longitude", "mag")
-)
+# Read data (cached, see datacache.py)
+E = datacache.array(url, datacache.csv("latitude", "longitude", "mag"))
 X, Y, M = E["longitude"], E["latitude"], E["mag"]
 M = 25 * (M - 4) ** 3
 
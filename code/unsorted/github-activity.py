@@ -4,49 +4,46 @@
 # License: BSD
 # ----------------------------------------------------------------------------
 import os
+import sys
 import numpy as np
 import html.parser
-import urllib.request
 import dateutil.parser
 from datetime import date, datetime
 from dateutil.relativedelta import relativedelta
 import matplotlib.pyplot as plt
 from matplotlib.patches import Polygon
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import datacache
+
 
 def github_contrib(user, year):
     """ Get GitHub user daily contribution """
 
-    # Check for a cached version (file)
-    filename = "github-{0}-{1}.html".format(user, year)
-    if os.path.exists(filename):
-        with open(filename) as file:
-            contents = file.read()
-    # Else get file from GitHub
-    else:
-        url = "https://github.com/users/{0}/contributions?to={1}-12-31"
-        url = url.format(user, year)
-        contents = str(urllib.request.urlopen(url).read())
-        with open(filename, "w") as file:
-            file.write(contents)
-
     # Parse result (html)
-    n = 1 + (date(year, 12, 31) - date(year, 1, 1)).days
-    C = -np.ones(n, dtype=int)
-
-    class HTMLParser(html.parser.HTMLParser):
-        def handle_starttag(self, tag, attrs):
-            if tag == "rect":
-                data = {key: value for (key, value) in attrs}
-                date = dateutil.parser.parse(data["data-date"])
-                count = int(data["data-count"])
-                day = date.timetuple().tm_yday - 1
-                if count > 0:
-                    C[day] = count
-
-    parser = HTMLParser()
-    parser.feed(contents)
-    return C
+    def parse(contents):
+        n = 1 + (date(year, 12, 31) - date(year, 1, 1)).days
+        C = -np.ones(n, dtype=int)
+
+        class HTMLParser(html.parser.HTMLParser):
+            def handle_starttag(self, tag, attrs):
+                if tag == "rect":
+                    data = {key: value for (key, value) in attrs}
+                    date = dateutil.parser.parse(data["data-date"])
+                    count = int(data["data-count"])
+                    day = date.timetuple().tm_yday - 1
+                    if count > 0:
+                        C[day] = count
+
+        parser = HTMLParser()
+        parser.feed(contents.decode())
+        return C
+
+    # Past years do not change, cached content never expires
+    url = "https://github.com/users/{0}/contributions?to={1}-12-31"
+    url = url.format(user, year)
+    ttl = None if year < date.today().year else 24 * 3600
+    return datacache.array(url, parse, name="github-contrib", ttl=ttl)
 
 
 def calmap(ax, year, data, origin="upper", weekstart="sun"):
@@ -16,8 +16,21 @@ try:
 except:
     pass
 
-from docutils.core import publish_cmdline
+import os
+import sys
+import pickle
+import hashlib
+import optparse
+import multiprocessing
+
+import docutils
+from docutils.core import publish_cmdline, publish_doctree, publish_from_doctree
+from docutils.frontend import OptionParser
+from docutils.parsers.rst import Parser
+from docutils.readers.standalone import Reader
+from docutils.writers.latex2e import Writer
 from docutils.parsers.rst import directives, Directive
+from docutils.utils import get_stylesheet_list
 from docutils import nodes
 
 
@@ -47,6 +60,162 @@ description = ('Generates LaTeX documents from standalone reStructuredText '
                'the full reference.')
 
 
+batch_usage = ('%prog --batch [--jobs=N] [--output-dir=DIR] [--cache-dir=DIR] '
+               '[options] <source> [<source> ...]')
+
+batch_description = ('Batch mode: converts several sources in a single '
+                     'interpreter, writing <output-dir>/<name>.tex for each '
+                     'source. Parsed doctrees are cached (keyed by the hash of '
+                     'the source and of every included file) such that only '
+                     'changed sources are re-parsed and re-written (sources '
+                     'are also re-written when the template or stylesheet '
+                     'files change). A source including other files is '
+                     're-parsed as a whole when any of them changes, e.g. '
+                     'main.rst (that includes every chapter) when a chapter '
+                     'changes.')
+
+
+def file_hash(filename):
+    """ Return the SHA1 hex digest of a file content """
+
+    with open(filename, 'rb') as file:
+        return hashlib.sha1(file.read()).hexdigest()
+
+
+def make_settings(options):
+    """ Build docutils settings from the (docutils) command line options """
+
+    parser = OptionParser(components=(Parser, Reader, Writer),
+                          read_config_files=True)
+    return parser.parse_args(options)
+
+
+def writer_dependencies(settings):
+    """ Return the hash of the template and stylesheet files (if any) """
+
+    filenames = [settings.template] + get_stylesheet_list(settings)
+    return { filename: file_hash(filename) for filename in filenames
+             if os.path.isfile(filename) }
+
+
+def convert(source, output_dir, cache_dir, options):
+    """
+    Convert a single rst source to LaTeX, using the doctree cache if possible.
+    Returns a tuple (source, status) where status is 'skipped' (output is up
+    to date), 'written' (doctree was cached but output is re-written) or
+    'parsed' (source was re-parsed).
+    """
+
+    name = os.path.splitext(os.path.basename(source))[0]
+    destination = os.path.join(output_dir, name + '.tex')
+    key = hashlib.sha1(('%s\0%s\0%s' % (docutils.__version__,
+                                          os.path.abspath(source),
+                                          '\0'.join(options))).encode())
+    writer = writer_dependencies(make_settings(options))
+    filename = os.path.join(cache_dir, '%s-%s.pickle' % (name, key.hexdigest()[:16]))
+
+    # Cache entry is valid if none of the recorded dependencies has changed
+    entry = None
+    if os.path.exists(filename):
+        try:
+            with open(filename, 'rb') as file:
+                entry = pickle.load(file)
+            for dependency, digest in entry['dependencies'].items():
+                if not os.path.exists(dependency) or file_hash(dependency) != digest:
+                    entry = None
+                    break
+        except (pickle.UnpicklingError, EOFError, KeyError, AttributeError):
+            entry = None
+
+    if entry is not None:
+        if (os.path.exists(destination) and entry.get('writer') == writer and
+            file_hash(destination) == entry['output']):
+            return source, 'skipped'
+        status = 'written'
+        doctree = entry['doctree']
+    else:
+        status = 'parsed'
+        settings = make_settings(options)
+        doctree = publish_doctree(open(source, encoding='utf-8').read(),
+                                  source_path=source, settings=settings)
+        dependencies = [source] + list(settings.record_dependencies.list)
+        entry = { 'dependencies': { dependency: file_hash(dependency)
+                                    for dependency in dependencies } }
+
+    # Reporter and transformer cannot be pickled, they're re-created by
+    # publish_from_doctree anyway.
+    doctree.reporter, doctree.transformer = None, None
+    entry['doctree'] = pickle.loads(pickle.dumps(doctree))
+    output = publish_from_doctree(doctree, writer_name='latex',
+                                  settings=make_settings(options))
+    with open(destination, 'wb') as file:
+        file.write(output)
+    entry['output'] = hashlib.sha1(output).hexdigest()
+    entry['writer'] = writer
+
+    os.makedirs(cache_dir, exist_ok=True)
+    with open(filename + '.tmp', 'wb') as file:
+        pickle.dump(entry, file, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(filename + '.tmp', filename)
+    return source, status
+
+
+def batch(argv):
+    """ Batch conversion of several sources (see batch_description) """
+
+    parser = optparse.OptionParser(usage=batch_usage,
+                                   description=batch_description)
+    parser.add_option('--batch', action='store_true')
+    parser.add_option('--jobs', type='int', default=os.cpu_count(),
+                      help='Number of parallel conversions (default: %default)')
+    parser.add_option('--output-dir', default='.',
+                      help='Output directory (default: %default)')
+    parser.add_option('--cache-dir', default='.cache/doctrees',
+                      help='Doctree cache directory (default: %default)')
+
+    # Options unknown to the batch parser are given to docutils, option
+    # values may be given as the next argument
+    docutils_parser = OptionParser(components=(Parser, Reader, Writer))
+    known, options, sources = [], [], []
+    argv = iter(argv)
+    for arg in argv:
+        name = arg.split('=')[0]
+        if parser.has_option(name):
+            target, option = known, parser.get_option(name)
+        elif arg.startswith('-'):
+            target, option = options, None
+            if docutils_parser.has_option(name):
+                option = docutils_parser.get_option(name)
+        else:
+            sources.append(arg)
+            continue
+        target.append(arg)
+        if option is not None and option.takes_value() and '=' not in arg:
+            value = next(argv, None)
+            if value is not None:
+                target.append(value)
+    values, _ = parser.parse_args(known)
+    if not sources:
+        parser.error('no source given')
+    os.makedirs(values.output_dir, exist_ok=True)
+
+    args = [(source, values.output_dir, values.cache_dir, options)
+            for source in sources]
+    jobs = max(1, min(values.jobs, len(sources)))
+    if jobs == 1:
+        results = [convert(*arg) for arg in args]
+    else:
+        with multiprocessing.Pool(jobs) as pool:
+            results = pool.starmap(convert, args)
+    for source, status in results:
+        print('%-8s %s' % (status, source), file=sys.stderr)
+
+
 for directive_name in ('code', 'code-block'):
     directives.register_directive(directive_name, CodeBlock)
-publish_cmdline(writer_name='latex', description=description)
+
+if __name__ == '__main__':
+    if '--batch' in sys.argv[1:]:
+        batch(sys.argv[1:])
+    else:
+        publish_cmdline(writer_name='latex', description=description)
@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+# ----------------------------------------------------------------------------
+# Title:   Scientific Visualisation - Python & Matplotlib
+# Author:  Nicolas P. Rougier
+# License: BSD
+# ----------------------------------------------------------------------------
+# Post-processing of generated figures such that they are deterministic
+# (rebuilding a figure gives a byte-identical file) and smaller:
+#
+#  - PNG: text and time chunks are removed, pixel data is re-filtered
+#         (adaptive filtering) and recompressed at maximum zlib level when it
+#         makes the file smaller. This is lossless.
+#  - PDF: creation/modification dates and matplotlib producer/creator strings
+#         are normalized and duplicated streams (e.g. identical images) are
+#         merged. Only classic cross-reference tables (as written by
+#         matplotlib) are handled, other PDFs are only normalized in place.
+#
+# Sizes are checked against per-figure budgets (figures/budgets.json).
+#
+# Usage: ./scripts/postprocess.py [--check] [--record] [files or directories]
+# ----------------------------------------------------------------------------
+import os
+import re
+import sys
+import json
+import zlib
+import struct
+import hashlib
+import argparse
+import numpy as np
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+figures_dir = os.path.join(root, "figures")
+budgets_filename = os.path.join(figures_dir, "budgets.json")
+
+# PNG chunks that are kept (all others, e.g. tEXt or tIME are discarded)
+png_keep = (b"IHDR", b"PLTE", b"tRNS", b"gAMA", b"cHRM", b"sRGB", b"iCCP",
+            b"sBIT", b"pHYs", b"bKGD")
+
+
+def png_chunks(data):
+    """ Return the list of (type, content) chunks of a PNG file content """
+
+    if data[:8] != b"\x89PNG\r\n\x1a\n":
+        raise ValueError("Not a PNG file")
+    chunks, index = [], 8
+    while index < len(data):
+        length, = struct.unpack(">I", data[index : index + 4])
+        kind = data[index + 4 : index + 8]
+        chunks.append((kind, data[index + 8 : index + 8 + length]))
+        index += 12 + length
+    return chunks
+
+
+def png_chunk(kind, content):
+    """ Return a PNG chunk (length, type, content and crc) """
+
+    crc = zlib.crc32(kind + content) & 0xFFFFFFFF
+    return struct.pack(">I", len(content)) + kind + content + struct.pack(">I", crc)
+
+
+def png_filter(raw, bpp):
+    """
+    Adaptive filtering of raw scanlines (height x stride array of bytes).
+    For each row, the filter (none, sub, up, average or paeth) giving the
+    minimum sum of absolute (signed) values is used. All filters are computed
+    at once since they only depend on unfiltered bytes.
+    """
+
+    raw = raw.astype(np.int16)
+    left = np.zeros_like(raw)
+    left[:, bpp:] = raw[:, :-bpp]
+    up = np.zeros_like(raw)
+    up[1:] = raw[:-1]
+    upleft = np.zeros_like(raw)
+    upleft[1:, bpp:] = raw[:-1, :-bpp]
+
+    p = left + up - upleft
+    pa, pb, pc = np.abs(p - left), np.abs(p - up), np.abs(p - upleft)
+    paeth = np.where((pa <= pb) & (pa <= pc), left, np.where(pb <= pc, up, upleft))
+
+    filtered = np.stack(
+        [raw, raw - left, raw - up, raw - ((left + up) >> 1), raw - paeth]
+    ).astype(np.uint8)
+    score = np.abs(filtered.view(np.int8).astype(np.int32)).sum(axis=2)
+    best = score.argmin(axis=0)
+    rows = filtered[best, np.arange(len(raw))]
+    return np.hstack([best.astype(np.uint8)[:, None], rows])
+
+
+def compress(blocks):
+    """ Compress a sequence of byte blocks as a single zlib stream """
+
+    compressor = zlib.compressobj(9)
+    return b"".join(compressor.compress(block) for block in blocks) + compressor.flush()
+
+
+def optimize_png(data, rows=256):
+    """ Return normalized and recompressed PNG content """
+
+    chunks = png_chunks(data)
+    header = chunks[0][1]
+    width, height, depth, color, _, _, interlace = struct.unpack(">IIBBBBB", header)
+    idat = b"".join(content for kind, content in chunks if kind == b"IDAT")
+
+    # Candidates are the original filtered data (recompressed) and, when
+    # possible, adaptive filtering or no filtering of the actual pixels.
+    # Pixels are processed by blocks of rows to limit memory usage.
+    candidates = [idat, compress([zlib.decompress(idat)])]
+    channels = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}[color]
+    if depth == 8 and interlace == 0:
+        import io
+        from PIL import Image
+
+        image = Image.open(io.BytesIO(data))
+        raw = np.frombuffer(image.tobytes(), dtype=np.uint8)
+        raw = raw.reshape(height, width * channels)
+
+        def adaptive():
+            for start in range(0, height, rows):
+                block = png_filter(raw[max(start - 1, 0) : start + rows], channels)
+                yield block[1 if start else 0 :].tobytes()
+
+        def unfiltered():
+            for start in range(0, height, rows):
+                block = raw[start : start + rows]
+                yield np.hstack([np.zeros((len(block), 1), np.uint8), block]).tobytes()
+
+        candidates.append(compress(adaptive()))
+        candidates.append(compress(unfiltered()))
+    idat = min(candidates, key=len)
+
+    output = b"\x89PNG\r\n\x1a\n"
+    for kind, content in chunks:
+        if kind in png_keep:
+            output += png_chunk(kind, content)
+    output += png_chunk(b"IDAT", idat) + png_chunk(b"IEND", b"")
+    return output
+
+
+def pdf_normalize(data):
+    """
+    Normalize dates and matplotlib producer/creator strings in place (same
+    length such that cross reference offsets remain valid).
+    """
+
+    def replace(match, new):
+        key, value = match.group(1), match.group(2)
+        if len(new) > len(value):
+            return match.group(0)
+        return b"/" + key + b" " + new + b" " * (len(value) - len(new))
+
+    def date(match):
+        return replace(match, b"(D:19700101000000Z)")
+
+    def version(match):
+        value = match.group(2)
+        pattern = rb" v\d+(\.\w+)*(, https://matplotlib.org)?"
+        return replace(match, re.sub(pattern, b"", value))
+
+    data = re.sub(rb"/(CreationDate|ModDate) ?(\(D:[^()]*\))", date, data)
+    return re.sub(rb"/(Producer|Creator) ?(\(Matplotlib[^()]*\))", version, data)
+
+
+def pdf_deduplicate(data):
+    """
+    Merge identical stream objects of a PDF with a classic cross-reference
+    table and return the new content (or the original one if it cannot be
+    processed).
+    """
+
+    match = re.search(rb"startxref\s+(\d+)\s+%%EOF\s*$", data)
+    if not match or data[int(match.group(1)) :][:4] != b"xref":
+        return data
+    xref = int(match.group(1))
+    trailer = data[xref:]
+    if len(re.findall(rb"(?<!start)xref", trailer)) != 1 or b"/Prev" in trailer:
+        return data
+
+    # Objects offsets from the cross-reference table
+    offsets = {}
+    for section in re.finditer(rb"(\d+) (\d+)\s*\n((?:\d{10} \d{5} [nf]\s*\n?)+)", trailer):
+        start = int(section.group(1))
+        for i, entry in enumerate(re.findall(rb"(\d{10}) \d{5} ([nf])", section.group(3))):
+            if entry[1] == b"n":
+                offsets[start + i] = int(entry[0])
+    if not offsets:
+        return data
+
+    # Object content (from offset to next offset or xref)
+    bounds = sorted(offsets.values()) + [xref]
+    objects = {}
+    for number, offset in offsets.items():
+        end = bounds[bounds.index(offset) + 1]
+        objects[number] = data[offset:end]
+
+    # References to merged objects are remapped (in dictionaries only)
+    remap = {}
+
+    def reference(match):
+        number = int(match.group(1))
+        return b"%d 0 R" % remap.get(number, number)
+
+    def rewrite(content):
+        index = content.find(b"stream")
+        head, tail = (content, b"") if index < 0 else (content[:index], content[index:])
+        return re.sub(rb"(\d+) 0 R", reference, head) + tail
+
+    # Identical streams (dictionary without length and stream content), until
+    # a fixpoint since merging streams can make the streams that reference
+    # them identical
+    while True:
+        canonical, merged = {}, {}
+        for number in sorted(objects):
+            if number in remap:
+                continue
+            content = rewrite(objects[number])
+            index = content.find(b"stream")
+            if index < 0:
+                continue
+            head = re.sub(rb"/Length\s+\d+(\s+\d+\s+R)?", b"", content[:index])
+            head = re.sub(rb"^\s*\d+\s+\d+\s+obj", b"", head)
+            key = hashlib.sha1(head + content[index:]).digest()
+            if key in canonical:
+                merged[number] = canonical[key]
+            else:
+                canonical[key] = number
+        if not merged:
+            break
+        remap.update(merged)
+        for number in remap:
+            while remap[number] in remap:
+                remap[number] = remap[remap[number]]
+    if not remap:
+        return data
+
+    # Rebuild file (header, kept objects, new xref and trailer)
+    output = data[: min(offsets.values())]
+    new_offsets = {}
+    for number in sorted(objects, key=lambda n: offsets[n]):
+        if number in remap:
+            continue
+        new_offsets[number] = len(output)
+        output += rewrite(objects[number])
+    size = max(offsets) + 1
+    start = len(output)
+    output += b"xref\n0 %d\n0000000000 65535 f \n" % size
+    for number in range(1, size):
+        if number in new_offsets:
+            output += b"%010d 00000 n \n" % new_offsets[number]
+        else:
+            output += b"0000000000 00000 f \n"
+    match = re.search(rb"trailer\s*(<<.*?>>)\s*startxref", trailer, re.S)
+    output += b"trailer\n" + rewrite(match.group(1)) + b"\n"
+    output += b"startxref\n%d\n%%%%EOF\n" % start
+    return output
+
+
+def optimize_pdf(data):
+    """ Return normalized and deduplicated PDF content """
+
+    return pdf_deduplicate(pdf_normalize(data))
+
+
+def process(filename, dry_run=False):
+    """ Post-process a single file, return (old size, new size) """
+
+    with open(filename, "rb") as file:
+        data = file.read()
+    extension = os.path.splitext(filename)[1].lower()
+    if extension == ".png":
+        output = optimize_png(data)
+    elif extension == ".pdf":
+        output = optimize_pdf(data)
+    else:
+        output = data
+    if output != data and not dry_run:
+        with open(filename + ".tmp", "wb") as file:
+            file.write(output)
+        os.replace(filename + ".tmp", filename)
+    return len(data), len(output)
+
+
+def files(paths):
+    """ Return the sorted list of PNG/PDF files from files or directories """
+
+    filenames = []
+    for path in paths:
+        if os.path.isdir(path):
+            for dirname, _, basenames in os.walk(path):
+                filenames.extend(os.path.join(dirname, b) for b in basenames)
+        else:
+            filenames.append(path)
+    return sorted(f for f in filenames if f.lower().endswith((".png", ".pdf")))
+
+
+def budget_key(filename):
+    return os.path.relpath(os.path.abspath(filename), figures_dir)
+
+
+# -----------------------------------------------------------------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Post-process figures")
+    parser.add_argument("paths", nargs="*", default=[figures_dir])
+    parser.add_argument("--dry-run", action="store_true", help="Do not write files")
+    parser.add_argument("--check", action="store_true", help="Check size budgets")
+    parser.add_argument("--record", action="store_true", help="Record size budgets")
+    parser.add_argument(
+        "--margin", type=float, default=0.1, help="Budget margin when recording"
+    )
+    args = parser.parse_args()
+
+    budgets = {}
+    if os.path.exists(budgets_filename):
+        with open(budgets_filename) as file:
+            budgets = json.load(file)
+
+    total_before, total_after, over = 0, 0, []
+    for filename in files(args.paths):
+        before, after = process(filename, args.dry_run)
+        total_before += before
+        total_after += after
+        key = budget_key(filename)
+        if args.record:
+            budgets[key] = int(after * (1 + args.margin))
+        elif args.check and key in budgets and after > budgets[key]:
+            over.append((key, after, budgets[key]))
+        print("%10d -> %10d  %s" % (before, after, filename), file=sys.stderr)
+    print("Total: %d -> %d bytes" % (total_before, total_after), file=sys.stderr)
+
+    if args.record:
+        with open(budgets_filename, "w") as file:
+            json.dump(dict(sorted(budgets.items())), file, indent=1)
+            file.write("\n")
+    for key, size, budget in over:
+        print("Over budget: %s (%d > %d bytes)" % (key, size, budget), file=sys.stderr)
+    sys.exit(1 if over else 0)
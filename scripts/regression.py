@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+# ----------------------------------------------------------------------------
+# Title:   Scientific Visualisation - Python & Matplotlib
+# Author:  Nicolas P. Rougier
+# License: BSD
+# ----------------------------------------------------------------------------
+# Visual regression suite for the book figures.
+#
+# All scripts are rendered at a low (preview) resolution using the parallel
+# runner and each output is compared against a baseline. Images are
+# downsampled (block average) before comparison such that antialiasing or
+# subpixel differences do not count as changes. Baselines are stored
+# downsampled (in scripts/baselines, tracked) such that they are small. A
+# JSON and an HTML report of changed figures (with baseline, current and
+# difference images) is written to the output directory.
+#
+# Scripts known to fail (missing optional dependency, network, ffmpeg,
+# etc., see expected_failures) are reported but not counted as problems.
+#
+# Usage: ./scripts/regression.py --update     # (re)generate baselines
+#        ./scripts/regression.py              # compare against baselines
+# ----------------------------------------------------------------------------
+import os
+import sys
+import json
+import html
+import shutil
+import argparse
+import functools
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+import runner
+
+regression_dir = os.path.join(runner.root, ".cache", "regression")
+baseline_dir = os.path.join(runner.root, "scripts", "baselines")
+
+# Scripts whose figures show measured timings: they are run but their
+# figures are neither stored nor compared
+timed = (
+    "code/optimization/line-benchmark.py",
+    "code/optimization/scatter-benchmark.py",
+)
+
+# Scripts known to fail, with the reason
+expected_failures = {
+    # Missing optional dependencies
+    "code/animation/earthquakes.py": "cartopy",
+    "code/animation/platecarree.py": "cartopy",
+    "code/scales-projections/geo-projections.py": "cartopy",
+    "code/unsorted/earthquakes.py": "cartopy",
+    "code/beyond/stamp.py": "imageio",
+    "code/colors/mona-lisa.py": "imageio",
+    "code/coordinates/collage.py": "imageio",
+    "code/reference/hatch.py": "imageio",
+    "code/unsorted/poster-layout.py": "imageio",
+    "code/colors/color-gradients.py": "scikit-image",
+    "code/showcases/text-spiral.py": "mpmath",
+    "code/unsorted/dyson-hatching.py": "noise",
+    # External programs, data or resources
+    "code/animation/sine-cosine-mp4.py": "ffmpeg",
+    "code/ornaments/bessel-functions.py": "latex",
+    "code/ornaments/latex-text-box.py": "latex",
+    "code/unsorted/github-activity.py": "network",
+    "code/animation/less-is-more.py": "missing texture.jpg",
+    "code/reference/font.py": "missing font file (absolute path)",
+    "code/rules/rule-2.py": "memory (more than 5GB)",
+    # Scripts written for an older matplotlib
+    "code/anatomy/zorder-plots.py": "matplotlib (cm.get_cmap)",
+    "code/beyond/radial-maze.py": "matplotlib (cm.get_cmap)",
+    "code/typography/typography-legibility.py": "matplotlib (cm.get_cmap)",
+    "code/colors/color-wheel.py": "matplotlib (read-only path vertices)",
+    "code/showcases/text-shadow.py": "matplotlib (read-only path vertices)",
+    "code/typography/projection-3d-gaussian.py": "matplotlib (read-only path vertices)",
+    "code/typography/typography-text-path.py": "matplotlib (ContourSet.collections)",
+    "code/reference/collection.py": "matplotlib (RegularPolyCollection arguments)",
+    "code/reference/scale.py": "matplotlib (LogScale basex)",
+    "code/showcases/waterfall-3d.py": "matplotlib (gca projection)",
+}
+
+
+def load(filename):
+    """ Load an image as a (height, width, 3) float array, over white """
+
+    import matplotlib.image
+
+    I = matplotlib.image.imread(filename)
+    if I.dtype == np.uint8:
+        I = I / 255
+    if I.ndim == 2:
+        I = np.dstack([I, I, I])
+    if I.shape[2] == 4:
+        I = I[..., :3] * I[..., 3:] + (1 - I[..., 3:])
+    return I[..., :3]
+
+
+def downsample(I, size=128):
+    """ Block average I such that its largest side is at most size """
+
+    factor = max(1, int(np.ceil(max(I.shape[:2]) / size)))
+    height, width = I.shape[0] // factor, I.shape[1] // factor
+    I = I[: height * factor, : width * factor]
+    return I.reshape(height, factor, width, factor, -1).mean(axis=(1, 3))
+
+
+def compare(baseline, current, size=128, threshold=0.1):
+    """
+    Compare two images and return a dictionary with keys shape (whether the
+    original shapes are identical), rms (root mean square difference), max
+    (maximum difference), changed (ratio of downsampled pixels whose
+    difference is above threshold) and the difference image itself.
+    """
+
+    # Baselines are usually already downsampled (no-op)
+    A, B = downsample(load(baseline), size), downsample(load(current), size)
+    if A.shape != B.shape:
+        return {"shape": False, "rms": 1.0, "max": 1.0, "changed": 1.0}, None
+    D = np.abs(A - B).max(axis=-1)
+    result = {
+        "shape": True,
+        "rms": float(np.sqrt((D ** 2).mean())),
+        "max": float(D.max()),
+        "changed": float((D > threshold).mean()),
+    }
+    return result, D
+
+
+def check(name, baseline_dir, current_dir, report_dir, size, threshold, tolerance):
+    """ Compare a single output (relative name) and save the difference """
+
+    baseline = os.path.join(baseline_dir, name)
+    current = os.path.join(current_dir, name)
+    if not os.path.exists(baseline):
+        return dict(name=name, status="new")
+    if not os.path.exists(current):
+        return dict(name=name, status="missing")
+    result, D = compare(baseline, current, size, threshold)
+    result["name"] = name
+    if not result["shape"]:
+        result["status"] = "resized"
+    elif result["changed"] > tolerance:
+        result["status"] = "changed"
+    else:
+        result["status"] = "ok"
+    if D is not None and result["status"] != "ok":
+        import matplotlib.image
+
+        filename = os.path.join(report_dir, "diff", name)
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        matplotlib.image.imsave(filename, D, vmin=0, vmax=1, cmap="magma")
+    return result
+
+
+def outputs(directory):
+    """ Return the sorted relative names of all PNG in directory """
+
+    names = []
+    for dirname, _, basenames in os.walk(directory):
+        for basename in basenames:
+            if basename.endswith(".png"):
+                filename = os.path.join(dirname, basename)
+                names.append(os.path.relpath(filename, directory))
+    return sorted(names)
+
+
+def report(results, scripts, baseline_dir, current_dir, report_dir):
+    """ Write the JSON and HTML reports, return the number of problems """
+
+    problems = [r for r in results if r["status"] != "ok"]
+    failures = [s for s in scripts if s["status"] != "ok"]
+    expected = [s for s in failures if s["script"] in expected_failures]
+    failures = [s for s in failures if s["script"] not in expected_failures]
+    with open(os.path.join(report_dir, "report.json"), "w") as file:
+        json.dump({"figures": results, "scripts": failures,
+                   "expected": [s["script"] for s in expected]}, file, indent=1)
+
+    def img(directory, name):
+        filename = os.path.join(directory, name)
+        if not os.path.exists(filename):
+            return ""
+        src = os.path.relpath(filename, report_dir)
+        return '<img src="%s"/>' % html.escape(src)
+
+    rows = []
+    for r in problems:
+        rows.append(
+            "<tr><td>%s<br/><b>%s</b><br/>%s</td><td>%s</td><td>%s</td><td>%s</td></tr>"
+            % (
+                html.escape(r["name"]),
+                r["status"],
+                "rms=%.4f changed=%.2f%%" % (r["rms"], 100 * r["changed"])
+                if "rms" in r
+                else "",
+                img(baseline_dir, r["name"]),
+                img(current_dir, r["name"]),
+                img(os.path.join(report_dir, "diff"), r["name"]),
+            )
+        )
+    for s in failures:
+        rows.append(
+            "<tr><td>%s<br/><b>%s</b></td><td colspan=3><pre>%s</pre></td></tr>"
+            % (html.escape(s["script"]), s["status"], html.escape(s["log"]))
+        )
+    for s in expected:
+        rows.append(
+            "<tr><td>%s<br/>expected failure</td><td colspan=3>%s</td></tr>"
+            % (html.escape(s["script"]), html.escape(expected_failures[s["script"]]))
+        )
+    with open(os.path.join(report_dir, "report.html"), "w") as file:
+        file.write(
+            "<html><head><meta charset='utf-8'><style>"
+            "img { width: 320px; } td { vertical-align: top; }"
+            "</style></head><body>"
+            "<h1>%d changed figure(s), %d failed script(s), "
+            "%d expected failure(s)</h1>"
+            "<table><tr><th></th><th>Baseline</th><th>Current</th>"
+            "<th>Difference</th></tr>%s</table></body></html>"
+            % (len(problems), len(failures), len(expected), "\n".join(rows))
+        )
+    return len(problems) + len(failures)
+
+
+# -----------------------------------------------------------------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Visual regression suite")
+    parser.add_argument("scripts", nargs="*", help="Scripts (default: all)")
+    parser.add_argument("--update", action="store_true", help="Update baselines")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count())
+    parser.add_argument("--dpi", type=float, default=50, help="Preview dpi")
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument(
+        "--size", type=int, default=128, help="Comparison (and baseline) size"
+    )
+    parser.add_argument(
+        "--threshold", type=float, default=0.1, help="Pixel difference threshold"
+    )
+    parser.add_argument(
+        "--tolerance", type=float, default=0.001, help="Ratio of changed pixels"
+    )
+    parser.add_argument("--baseline", default=baseline_dir, help="Baselines")
+    parser.add_argument("--output", default=regression_dir)
+    args = parser.parse_args()
+
+    current_dir = os.path.join(args.output, "current")
+    report_dir = os.path.join(args.output, "report")
+    filenames = args.scripts or runner.scripts()
+    scripts = runner.run_all(
+        filenames, current_dir, args.dpi, args.jobs, args.timeout,
+        # Deterministic outputs (e.g. random seeds relying on hash)
+        env={"PYTHONHASHSEED": "0", "SOURCE_DATE_EPOCH": "0"},
+    )
+
+    # Only outputs of the scripts that have been run successfully are updated
+    # or compared (failed scripts are reported as such)
+    succeeded = [
+        os.path.join(runner.root, s["script"])
+        for s in scripts if s["status"] == "ok" and s["script"] not in timed
+    ]
+    prefixes = tuple(
+        os.path.relpath(runner.output_dir(f, current_dir), current_dir) + os.sep
+        for f in succeeded
+    )
+
+    if args.update:
+        import matplotlib.image
+
+        for prefix in prefixes:
+            shutil.rmtree(os.path.join(args.baseline, prefix), ignore_errors=True)
+        for name in outputs(current_dir):
+            if name.startswith(prefixes):
+                filename = os.path.join(args.baseline, name)
+                os.makedirs(os.path.dirname(filename), exist_ok=True)
+                I = downsample(load(os.path.join(current_dir, name)), args.size)
+                matplotlib.image.imsave(filename, np.clip(I, 0, 1),
+                                        metadata={"Software": None})
+        print("Baselines updated in %s" % args.baseline, file=sys.stderr)
+        sys.exit(0)
+
+    names = sorted(set(outputs(args.baseline)) | set(outputs(current_dir)))
+    names = [name for name in names if name.startswith(prefixes)]
+
+    shutil.rmtree(report_dir, ignore_errors=True)
+    os.makedirs(report_dir)
+    with ProcessPoolExecutor(args.jobs) as executor:
+        results = list(
+            executor.map(
+                functools.partial(
+                    check,
+                    baseline_dir=args.baseline,
+                    current_dir=current_dir,
+                    report_dir=report_dir,
+                    size=args.size,
+                    threshold=args.threshold,
+                    tolerance=args.tolerance,
+                ),
+                names,
+            )
+        )
+    count = report(results, scripts, args.baseline, current_dir, report_dir)
+    print("%d problem(s), see %s" % (count, os.path.join(report_dir, "report.html")),
+          file=sys.stderr)
+    sys.exit(1 if count else 0)
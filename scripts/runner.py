@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+# ----------------------------------------------------------------------------
+# Title:   Scientific Visualisation - Python & Matplotlib
+# Author:  Nicolas P. Rougier
+# License: BSD
+# ----------------------------------------------------------------------------
+# Parallel runner for the book scripts.
+#
+# Each script is run in its own process (from its own directory since scripts
+# use relative paths) with a non-interactive backend. In preview mode, every
+# call to savefig is redirected to an output directory and rendered as a PNG
+# at a low resolution, plt.show is disabled and animations only save their
+# current frame. This allows to render the whole book quickly without
+# touching the figures directory.
+#
+# Usage: ./scripts/runner.py [--jobs N] [--dpi 50] [--output DIR] [scripts]
+# ----------------------------------------------------------------------------
+import os
+import sys
+import json
+import shutil
+import time
+import argparse
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+code_dir = os.path.join(root, "code")
+
+# Code executed in the child process before running the actual script
+bootstrap = r"""
+import os, sys, runpy
+import matplotlib
+matplotlib.use("agg")
+import matplotlib.pyplot as plt
+import matplotlib.figure
+import matplotlib.animation
+import numpy as np
+
+# Scripts that do not seed their random generator are made reproducible
+np.random.seed(0)
+
+script, output, dpi = sys.argv[1], sys.argv[2], float(sys.argv[3])
+savefig = matplotlib.figure.Figure.savefig
+
+def preview_savefig(self, fname, *args, **kwargs):
+    if isinstance(fname, (str, os.PathLike)):
+        name = os.path.splitext(os.path.basename(os.fspath(fname)))[0]
+    else:
+        name = "figure"
+    for key in ("dpi", "format", "metadata", "pil_kwargs"):
+        kwargs.pop(key, None)
+    os.makedirs(output, exist_ok=True)
+    return savefig(self, os.path.join(output, name + ".png"),
+                   *args, dpi=dpi, format="png", **kwargs)
+
+def preview_save(self, filename, *args, **kwargs):
+    self._init_draw()
+    preview_savefig(self._fig, filename)
+
+matplotlib.figure.Figure.savefig = preview_savefig
+matplotlib.animation.Animation.save = preview_save
+plt.show = lambda *args, **kwargs: None
+
+sys.argv = [script]
+sys.path.insert(0, os.path.dirname(os.path.abspath(script)))
+runpy.run_path(script, run_name="__main__")
+"""
+
+
+# Modules imported by scripts (they save data or frames but are not figure
+# scripts themselves)
+modules = (
+    "datacache.py",
+    "animation/export.py",
+    "animation/framecache.py",
+    "animation/timing.py",
+    "rules/projections.py",
+    "showcases/movie.py",
+)
+
+
+def scripts(directory=code_dir):
+    """ Return the sorted list of scripts that save a figure or a movie """
+
+    filenames = []
+    for dirname, dirnames, basenames in os.walk(directory):
+        dirnames[:] = sorted(d for d in dirnames if not d.startswith((".", "__")))
+        for basename in sorted(basenames):
+            if not basename.endswith(".py"):
+                continue
+            filename = os.path.join(dirname, basename)
+            if os.path.relpath(filename, code_dir).replace(os.sep, "/") in modules:
+                continue
+            with open(filename, encoding="utf-8") as file:
+                source = file.read()
+            if "savefig" in source or ".save(" in source:
+                filenames.append(filename)
+    return filenames
+
+
+def output_dir(script, output):
+    """ Return the output directory for script (chapter/name) """
+
+    relname = os.path.relpath(os.path.abspath(script), code_dir)
+    return os.path.join(output, os.path.splitext(relname)[0])
+
+
+def run(script, output, dpi=50, timeout=300, env=None):
+    """
+    Run a single script in preview mode and return a result dictionary with
+    keys script, status ('ok', 'error' or 'timeout'), time, outputs and log.
+    """
+
+    script = os.path.abspath(script)
+    output = output_dir(script, os.path.abspath(output))
+    shutil.rmtree(output, ignore_errors=True)
+    environ = dict(os.environ, MPLBACKEND="agg")
+    environ.update(env or {})
+    args = [sys.executable, "-c", bootstrap, script, output, str(dpi)]
+    start = time.perf_counter()
+    try:
+        process = subprocess.run(
+            args,
+            cwd=os.path.dirname(script),
+            env=environ,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            timeout=timeout,
+        )
+        status = "ok" if process.returncode == 0 else "error"
+        log = process.stdout.decode(errors="replace")
+    except subprocess.TimeoutExpired as error:
+        status = "timeout"
+        log = (error.stdout or b"").decode(errors="replace")
+    outputs = []
+    if os.path.isdir(output):
+        outputs = sorted(os.path.join(output, f) for f in os.listdir(output))
+    return {
+        "script": os.path.relpath(script, root),
+        "status": status,
+        "time": time.perf_counter() - start,
+        "outputs": [os.path.relpath(f, root) for f in outputs],
+        "log": log[-2000:],
+    }
+
+
+def run_all(filenames, output, dpi=50, jobs=None, timeout=300, env=None, verbose=True):
+    """ Run all scripts in parallel (one process per script) """
+
+    # Threads are enough since each of them waits on its own child process
+    jobs = jobs or os.cpu_count()
+    results = []
+    with ThreadPoolExecutor(jobs) as executor:
+        futures = [
+            executor.submit(run, filename, output, dpi, timeout, env)
+            for filename in filenames
+        ]
+        for future in futures:
+            result = future.result()
+            results.append(result)
+            if verbose:
+                print(
+                    "%-8s %6.2fs  %s"
+                    % (result["status"], result["time"], result["script"]),
+                    file=sys.stderr,
+                )
+    return results
+
+
+# -----------------------------------------------------------------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run book scripts in parallel")
+    parser.add_argument("scripts", nargs="*", help="Scripts (default: all)")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count())
+    parser.add_argument("--dpi", type=float, default=50, help="Preview dpi")
+    parser.add_argument("--timeout", type=float, default=300)
+    parser.add_argument("--output", default=os.path.join(root, ".cache", "preview"))
+    args = parser.parse_args()
+
+    filenames = args.scripts or scripts()
+    results = run_all(filenames, args.output, args.dpi, args.jobs, args.timeout)
+    os.makedirs(args.output, exist_ok=True)
+    with open(os.path.join(args.output, "results.json"), "w") as file:
+        json.dump(results, file, indent=1)
+    failed = [r for r in results if r["status"] != "ok"]
+    print("%d scripts, %d failed" % (len(results), len(failed)), file=sys.stderr)
+    sys.exit(1 if failed else 0)